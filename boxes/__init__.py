@@ -21,7 +21,6 @@ import datetime
 import gettext
 import inspect
 import math
-import random
 import re
 import sys
 from argparse import ArgumentParser
@@ -31,13 +30,8 @@ from shlex import quote
 from typing import Any
 from xml.sax.saxutils import quoteattr
 
-import qrcode
-from shapely.geometry import *
-from shapely.ops import split
-
 from boxes import edges, formats, gears, parts, pulley
 from boxes.Color import *
-from boxes.qrcode_factory import BoxesQrCodeFactory
 from boxes.vectors import kerf
 
 ### Helpers
@@ -91,6 +85,96 @@ def holeCol(func):
     return f
 
 
+def replayable(func):
+    """
+    Wrapper: record the drawing and replay it for identical calls
+
+    Only active for calls passing replay - a value that covers everything
+    the drawing depends on besides the arguments, the edges used and the
+    general settings listed in Boxes._replayAttributes, e.g. the other
+    attributes of the generator read by a custom edge. Use () if there
+    is nothing else. Calls with the same arguments and replay value draw
+    the same. Edges are looked up in arguments with "edge" in their
+    name. Calls with callbacks or other arguments that can't be compared
+    are always executed.
+
+    :param func: function to wrap
+    """
+    signature = inspect.signature(func)
+
+    @wraps(func)
+    def f(self, *args, replay=None, **kw):
+        key = None
+        if replay is not None:
+            arguments = signature.bind(self, *args, **kw)
+            arguments.apply_defaults()
+            key = self._replayKey(func.__name__, arguments.arguments, replay)
+        if key is None:
+            return func(self, *args, **kw)
+        entry = self._replayCache.get(key)
+        if entry is None:
+            # record only parts that are drawn more than once
+            self._replayCache[key] = False
+            return func(self, *args, **kw)
+        if entry is False:
+            with self.ctx.record() as recording:
+                result = func(self, *args, **kw)
+            self._replayCache[key] = entry = (recording, result)
+        recording, result = entry
+        self.ctx.replay(recording)
+        return result
+
+    return f
+
+
+def instanced(func):
+    """
+    Wrapper: draw as instance of a symbol if the instances setting is on
+
+    The drawing is recorded at the origin once for all calls with the
+    same arguments - but x and y - and replayed as symbol at x, y. See
+    drawing.Surface.
+
+    :param func: function to wrap - must draw relative to x, y and restore the position
+    """
+    signature = inspect.signature(func)
+
+    @wraps(func)
+    def f(self, *args, **kw):
+        if not self.instances:
+            return func(self, *args, **kw)
+        kw = dict(kw)
+        color = kw.pop("color", None)
+        try:
+            arguments = signature.bind(self, *args, **kw)
+        except TypeError:
+            return func(self, *args, color=color, **kw) if color else func(self, *args, **kw)
+        arguments.apply_defaults()
+        arguments = {k: v for k, v in arguments.arguments.items() if k != "self"}
+        x, y = arguments.pop("x"), arguments.pop("y")
+        if color is not None:
+            arguments["color"] = color
+        key = self._replayKey(func.__name__, arguments)
+        recording = self._symbols.get(key) if key is not None else False
+        if recording is None:
+            with self.ctx.record() as recording:
+                func(self, 0, 0, **arguments)
+            if any(call[0] in "TP" for call in recording.calls):
+                # texts and parts can't be used as symbols
+                recording = False
+            self._symbols[key] = recording
+        if recording is False:
+            return func(self, x, y, **arguments)
+        pt = self.ctx.get_current_point()
+        self.ctx.stroke()
+        with self.saved_context():
+            self.moveTo(x, y)
+            self.ctx.replay(recording, key)
+        self.ctx.move_to(*pt)
+
+    return f
+
+
 #############################################################################
 ### Building blocks
 #############################################################################
@@ -148,6 +232,109 @@ HexSizes = { # (nut width, nut height, shaft width)
     "2-1/2": (3.750*25.4, 2.209*25.4, (2+1/2)*25.4),
 }
 
+def poissonDiskHoles(polygon, min_radius, max_radius, hspace=3, bspace=0, max_random=1000, seed=None, k=30):
+    """
+    Fill a polygon with round holes of varying size - Bridson style
+
+    Holes grow from randomly seeded ones: k random candidates around an
+    active hole are tested at once and the first one fitting is added.
+    Holes without fitting candidates are retired. Random seeds are tried
+    until 20 in a row fail to fit. Large holes are placed first, then the
+    gaps are filled until no active holes are left. As a safety bound at
+    most max_random attempts to place a hole are made per 100x100mm of
+    area - each testing one random seed or the k candidates around a
+    hole. About 3 attempts per hole are needed.
+
+    :param polygon:    shapely Polygon to fill
+    :param min_radius: minimum hole radius
+    :param max_radius: maximum hole radius
+    :param hspace:     space between holes
+    :param bspace:     space to border
+    :param max_random: maximum number of attempts to place a hole per 100x100mm
+    :param seed:       seed of the random numbers, None for a new pattern each time
+    :param k:          candidates tested around each hole
+    :return:           list of (x, y, radius)
+    """
+    import numpy as np
+    import shapely
+
+    rng = np.random.default_rng(seed)
+    shapely.prepare(polygon)
+    exterior = polygon.exterior
+    min_x, min_y, max_x, max_y = polygon.bounds
+    # holes affecting each other are at most one cell apart
+    cell = 2 * max_radius + hspace
+    grid: dict[tuple[int, int], list[tuple[float, float, float]]] = {}
+    # holes with (a lower bound of) their distance to the border
+    holes: list[tuple[float, float, float, float]] = []
+    active: list[tuple[float, float, float, float]] = []
+    tries = 0  # attempts to place a hole
+    max_tries = max_random * max(1.0, polygon.area / 10000)
+
+    def fit(xs, ys, x, y, reach, border=0.0):
+        """Add the first candidate that fits, return if one did
+
+        All candidates are within reach - cell of x, y. If given, border
+        is a lower bound of the distance of all candidates to the border
+        large enough to not limit the holes.
+        """
+        if border:
+            b = np.full(len(xs), border)
+            r = np.full(len(xs), float(max_radius))
+        else:
+            b = shapely.distance(exterior, shapely.points(xs, ys))
+            r = np.minimum(b - bspace, max_radius)
+            r[~shapely.contains_xy(polygon, xs, ys)] = 0
+        near = [hole
+                for cx in range(int((x - reach) // cell), int((x + reach) // cell) + 1)
+                for cy in range(int((y - reach) // cell), int((y + reach) // cell) + 1)
+                for hole in grid.get((cx, cy), ())]
+        if near:
+            nx, ny, nr = np.array(near).T
+            d = np.hypot(xs[:, None] - nx, ys[:, None] - ny) - nr - hspace
+            r = np.minimum(r, d.min(axis=1))
+        nonlocal tries
+        tries += 1
+        fitting = np.flatnonzero(r >= min_radius)
+        if not fitting.size:
+            return False
+        i = fitting[0]
+        hole = (float(xs[i]), float(ys[i]), float(r[i]), float(b[i]))
+        grid.setdefault((int(hole[0] // cell), int(hole[1] // cell)), []).append(hole[:3])
+        holes.append(hole)
+        active.append(hole)
+        return True
+
+    def grow(near, far):
+        """Add holes around the active ones at distances near to far"""
+        while active and tries < max_tries:
+            i = rng.integers(len(active))
+            x, y, r, b = active[i]
+            d = r + hspace + rng.uniform(near, far, k)
+            a = rng.uniform(0, 2 * math.pi, k)
+            b -= r + hspace + far
+            if b - bspace < max_radius:
+                b = 0.0
+            if not fit(x + d * np.cos(a), y + d * np.sin(a), x, y, r + hspace + far + cell, b):
+                active[i] = active[-1]
+                active.pop()
+
+    # large holes first
+    misses = 0
+    while tries < max_tries and misses < 20:
+        x = rng.uniform(min_x + bspace, max_x - bspace, 1)
+        y = rng.uniform(min_y + bspace, max_y - bspace, 1)
+        if not fit(x, y, x[0], y[0], cell):
+            misses += 1
+            continue
+        misses = 0
+        grow(max_radius, 2 * max_radius)
+    # then fill the gaps
+    active.extend(holes)
+    grow(min_radius, 2 * max_radius)
+    return [hole[:3] for hole in holes]
+
+
 class NutHole:
     """Draw a hex nut"""
 
@@ -284,7 +471,7 @@ Values:
 * absolute
   * fill_pattern :        "no fill" : style of hole pattern
   * hole_style :          "round" : style of holes (does not apply to fill patterns 'vbar' and 'hbar')
-  * max_random :          1000 : maximum number of random holes
+  * max_random :          1000 : maximum number of attempts to place a random hole per 100x100mm (the pattern stops earlier when no more holes fit)
   * bar_length :          50 : maximum length of bars
   * hole_max_radius :     12.0 : maximum radius of generated holes (in mm)
   * hole_min_radius :     4.0 : minimum radius of generated holes (in mm)
@@ -314,6 +501,9 @@ class Boxes:
     webinterface = True
     ui_group = "Misc"
     UI = ""
+    instances = False  # draw holes as instances of symbols, see instanced()
+    # attributes set up by __init__ that all instances of a class can share
+    _sharedAttributes = ("argparser", "formats", "translations")
 
     description: str = ""  # Markdown syntax is supported
 
@@ -381,10 +571,56 @@ class Boxes:
             "--inner_corners", action="store", type=str, default="loop",
             choices=["loop", "corner", "backarc"],
             help="style for inner corners [\U0001F6C8](https://florianfesti.github.io/boxes/html/usermanual.html#inner-corners)")
+        defaultgroup.add_argument(
+            "--optimize_path", action="store", type=boolarg, default=False,
+            help="reorder and flip paths to reduce travel of the laser head [\U0001F6C8](https://florianfesti.github.io/boxes/html/usermanual.html#optimize-path)")
+        defaultgroup.add_argument(
+            "--remove_duplicates", action="store", type=boolarg, default=False,
+            help="cut lines shared by several parts only once [\U0001F6C8](https://florianfesti.github.io/boxes/html/usermanual.html#remove-duplicates)")
+        defaultgroup.add_argument(
+            "--compact_output", action="store", type=boolarg, default=False,
+            help="simplify paths and write them with relative coordinates and short numbers (SVG and PS only) [\U0001F6C8](https://florianfesti.github.io/boxes/html/usermanual.html#compact-output)")
+        defaultgroup.add_argument(
+            "--precision", action="store", type=int, default=3,
+            help="decimals of the coordinates in compact output [\U0001F6C8](https://florianfesti.github.io/boxes/html/usermanual.html#compact-output)")
+        defaultgroup.add_argument(
+            "--instances", action="store", type=boolarg, default=False,
+            help="write identical holes only once and reference them (SVG only - smaller files, not supported by all programs) [\U0001F6C8](https://florianfesti.github.io/boxes/html/usermanual.html#instances)")
         defaultgroup.add_argument(
             "--burn", action="store", type=float, default=0.1,
             help='burn correction (in mm)(bigger values for tighter fit) [\U0001F6C8](https://florianfesti.github.io/boxes/html/usermanual.html#burn)')
 
+    @classmethod
+    def _initialState(cls) -> dict[str, Any]:
+        """Copy of the attributes of a new instance
+
+        __init__ runs once per class. The argument parser and the other
+        _sharedAttributes are shared, everything else is copied.
+        """
+        # Prototypes are kept per parser class: boxesserver replaces
+        # ArgumentParser with a subclass raising errors instead of exiting
+        parserClass = ArgumentParser
+        if "_prototypes" not in cls.__dict__:
+            cls._prototypes = {}
+        prototype = cls._prototypes.get(parserClass)
+        if prototype is None:
+            prototype = cls._prototypes[parserClass] = dict(vars(cls()))
+        state = {k: v if k in cls._sharedAttributes else copy.deepcopy(v)
+                 for k, v in prototype.items()}
+        state["metadata"]["creation_date"] = datetime.datetime.now()
+        return state
+
+    @classmethod
+    def cachedInstance(cls):
+        """New instance without building the argument parser again
+
+        Same as cls() but a lot faster after the first call. The instance
+        shares its argument parser with the other instances created this way.
+        """
+        box = cls.__new__(cls)
+        box.__dict__.update(cls._initialState())
+        return box
+
     @contextmanager
     def saved_context(self):
         """
@@ -435,6 +671,9 @@ class Boxes:
         self.spacing = 2 * self.burn + 0.5 * self.thickness
         self.set_font("sans-serif")
         self._buildObjects()
+        self._replayCache: dict[Any, Any] = {}
+        self._symbols: dict[Any, Any] = {}
+        self.surface.instances = self.instances
         if self.reference and self.format != 'svg_Ponoko':
             self.move(self.reference, 10, "up", before=True)
             self.ctx.rectangle(0, 0, self.reference, 10)
@@ -621,8 +860,11 @@ class Boxes:
     fingerHolesAt : Any
 
     def _buildObjects(self):
-        """Add default edges and parts"""
-        self.edges = {}
+        """Add default edges and parts
+
+        Most edges are only created when their char is first looked up.
+        """
+        self.edges = edges.LazyEdges()
         self.addPart(edges.Edge(self, None))
         self.addPart(edges.OutSetEdge(self, None))
         edges.GripSettings(self.thickness).edgeObjects(self)
@@ -634,40 +876,27 @@ class Boxes:
         s.edgeObjects(self)
         self.addPart(edges.FingerHoles(self, s), name="fingerHolesAt")
         # Stackable
-        edges.StackableSettings(self.thickness, True,
-            **self.edgesettings.get("Stackable", {})).edgeObjects(self)
+        self._lazyEdges("sSšŠ", edges.StackableSettings, "Stackable")
         # Dove tail joints
-        edges.DoveTailSettings(self.thickness, True,
-            **self.edgesettings.get("DoveTail", {})).edgeObjects(self)
+        self._lazyEdges("dD", edges.DoveTailSettings, "DoveTail")
         # Flex
-        s = edges.FlexSettings(self.thickness, True,
-                **self.edgesettings.get("Flex", {}))
-        self.addPart(edges.FlexEdge(self, s))
+        self._lazyEdges("X", edges.FlexSettings, "Flex", edges.FlexEdge)
         # Clickable
-        edges.ClickSettings(self.thickness, True,
-                **self.edgesettings.get("Click", {})).edgeObjects(self)
+        self._lazyEdges("cC", edges.ClickSettings, "Click")
         # Hinges
-        edges.HingeSettings(self.thickness, True,
-                **self.edgesettings.get("Hinge", {})).edgeObjects(self)
-        edges.ChestHingeSettings(self.thickness, True,
-                **self.edgesettings.get("ChestHinge", {})).edgeObjects(self)
-        edges.CabinetHingeSettings(self.thickness, True,
-                **self.edgesettings.get("CabinetHinge", {})).edgeObjects(self)
+        self._lazyEdges("iIjJkK", edges.HingeSettings, "Hinge")
+        self._lazyEdges("oOpPqQ", edges.ChestHingeSettings, "ChestHinge")
+        self._lazyEdges("uUvV", edges.CabinetHingeSettings, "CabinetHinge")
         # Sliding Lid
-        edges.SlideOnLidSettings(self.thickness, True,
-                **self.edgesettings.get("SlideOnLid", {})).edgeObjects(self)
+        self._lazyEdges("lLnmNM", edges.SlideOnLidSettings, "SlideOnLid")
         # Rounded Triangle Edge
-        edges.RoundedTriangleEdgeSettings(self.thickness, True,
-                **self.edgesettings.get("RoundedTriangleEdge", {})).edgeObjects(self)
+        self._lazyEdges("tT", edges.RoundedTriangleEdgeSettings, "RoundedTriangleEdge")
         # Grooved Edge
-        edges.GroovedSettings(self.thickness, True,
-                              **self.edgesettings.get("Grooved", {})).edgeObjects(self)
+        self._lazyEdges("zZ", edges.GroovedSettings, "Grooved")
         # Mounting Edge
-        edges.MountingSettings(self.thickness, True,
-                              **self.edgesettings.get("Mounting", {})).edgeObjects(self)
+        self._lazyEdges("G", edges.MountingSettings, "Mounting")
         # Handle Edge
-        edges.HandleEdgeSettings(self.thickness, True,
-                              **self.edgesettings.get("HandleEdge", {})).edgeObjects(self)
+        self._lazyEdges("yY", edges.HandleEdgeSettings, "HandleEdge")
         # HexHoles
         self.hexHolesSettings = HexHolesSettings(self.thickness, True,
                 **self.edgesettings.get("HexHoles", {}))
@@ -681,12 +910,30 @@ class Boxes:
         self.addPart(NutHole(self, None))
         # Gears
         self.addPart(gears.Gears(self))
-        s = edges.GearSettings(self.thickness, True,
-                **self.edgesettings.get("Gear", {}))
-        self.addPart(edges.RackEdge(self, s))
+        self._lazyEdges("R", edges.GearSettings, "Gear", edges.RackEdge)
         self.addPart(pulley.Pulley(self))
         self.addPart(parts.Parts(self))
 
+    def _lazyEdges(self, chars, settingsClass, name, edgeClass=None):
+        """Create the edges of settingsClass on first lookup of chars
+
+        :param chars: chars of all edges created
+        :param settingsClass: Settings class, uses edgesettings[name]
+        :param name: prefix of the settings
+        :param edgeClass: create only this edge instead of using .edgeObjects()
+        """
+        thickness = self.thickness
+        kw = dict(self.edgesettings.get(name, {}))
+
+        def build():
+            s = settingsClass(thickness, True, **kw)
+            if edgeClass is None:
+                s.edgeObjects(self)
+            else:
+                self.addPart(edgeClass(self, s))
+
+        self.edges.lazy(chars, build)
+
     def adjustSize(self, l, e1=True, e2=True):
         # Char to edge object
         e1 = self.edges.get(e1, e1)
@@ -753,6 +1000,51 @@ class Boxes:
                     callback(number)
             self.ctx.move_to(0, 0)
 
+    # Attributes the drawing of replayable() parts may depend on
+    _replayAttributes = ("thickness", "burn", "spacing", "tabs", "debug",
+                         "labels", "bedBoltSettings", "hexHolesSettings")
+
+    def _replayKey(self, name, arguments, replay=None):
+        """Key for a call of a replayable() or instanced() method
+
+        replay is the value passed to a replayable() method. Returns None
+        if there is no key.
+        """
+        try:
+            values = tuple(self._replayValue(v) for k, v in arguments.items() if k != "self")
+            chars = {"e"}
+            for k, v in arguments.items():
+                if "edge" not in k:
+                    continue
+                if isinstance(v, str):
+                    chars.update(v)
+                elif isinstance(v, (list, tuple)):
+                    chars.update(c for c in v if isinstance(c, str) and len(c) == 1)
+            edge_values = tuple((c, self._replayValue(self.edges[c])) for c in sorted(chars) if c in self.edges)
+            attributes = tuple(self._replayValue(getattr(self, a, None)) for a in self._replayAttributes)
+            key = (name, values, edge_values, attributes, self._replayValue(self.ctx.get_state()),
+                   self._replayValue(replay))
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def _replayValue(self, value, depth=0):
+        """Hashable representation of value, raises TypeError if there is none"""
+        if value is None or value.__class__ in (bool, int, float, str):
+            return value
+        if depth > 8:
+            raise TypeError("Value nested too deep")
+        if isinstance(value, (list, tuple)):
+            return tuple([self._replayValue(v, depth + 1) for v in value])
+        if isinstance(value, dict):
+            return tuple([(k, self._replayValue(v, depth + 1)) for k, v in value.items()])
+        if isinstance(value, (edges.BaseEdge, edges.Settings)):
+            return (id(value), tuple([(k, self._replayValue(v, depth + 1))
+                                      for k, v in value.__dict__.items()
+                                      if k != "boxes" and k != "ctx"]))
+        raise TypeError(f"Can't compare {type(value)}")
+
     def getEntry(self, param, idx):
         """
         Get entry from list or items itself
@@ -768,24 +1060,70 @@ class Boxes:
         else:
             return param
 
-    def close(self):
+    def close(self, formats=None):
         """Finish rendering
 
         Flush canvas to disk and convert output to requested format if needed.
-        Call after .render()"""
+        Call after .render()
+
+        If a list of formats is given the drawing is written in each of
+        them and a dict format -> data is returned. This can be repeated
+        for further formats without rendering again."""
+        if formats is None:
+            if self.ctx is None:
+                return
+            self._flush()
+            return self._write(self.format)
+
+        if self.ctx is not None:
+            self._flush()
+        return {fmt: self._write(fmt) for fmt in formats}
+
+    def _write(self, fmt):
+        """Write the flushed drawing in the given format"""
+        if fmt == self.format:
+            surface = self.surface
+        else:
+            if fmt not in self.formats.formats:
+                raise ValueError(f"Unknown format: {fmt}")
+            if "svg_Ponoko" in (fmt, self.format):
+                # Ponoko uses different line settings while rendering
+                raise ValueError("svg_Ponoko can't be combined with other formats")
+            surface = self.formats.getSurface(fmt)[0]
+            surface.parts = self.surface.parts
+            surface.symbols = self.surface.symbols
+            surface.instances = self.instances
+            surface.precision = self.surface.precision
+            surface.set_metadata(self.metadata)
+        data = surface.finish(self.inner_corners)
+        return self.formats.convert(data, fmt)
+
+    def close_iter(self):
+        """Finish rendering like .close() but return an iterator over chunks
+        (bytes) of the output.
+
+        For formats that do not need conversion the output is created while
+        the iterator is consumed."""
         if self.ctx is None:
-            return
+            return iter(())
+        if self.formats.needsConversion(self.format):
+            return iter((self.close().getvalue(),))
+
+        self._flush()
+        return self.surface.finish_iter(self.inner_corners)
 
+    def _flush(self):
         self.ctx.stroke()
         self.ctx = None
 
         self.surface.set_metadata(self.metadata)
 
         self.surface.flush()
-        data = self.surface.finish(self.inner_corners)
-
-        data = self.formats.convert(data, self.format)
-        return data
+        self.surface.precision = self.precision if self.compact_output else None
+        if self.remove_duplicates:
+            self.metadata["duplicates"] = self.surface.remove_duplicates(inner_corners=self.inner_corners)
+        if self.optimize_path:
+            self.metadata["travel"] = self.surface.optimize_order()
 
     ############################################################
     ### Turtle graphics commands
@@ -1288,6 +1626,7 @@ class Boxes:
             a += da
         self.ctx.stroke()
 
+    @instanced
     @restore
     @holeCol
     def regularPolygonHole(self, x, y, r=0.0, d=0.0, n=6, a=0.0, tabs=0, corner_radius=0.0):
@@ -1332,6 +1671,7 @@ class Boxes:
             self.edge(flat_side_length)
             self.corner(360/n, cr_)
 
+    @instanced
     @restore
     @holeCol
     def hole(self, x, y, r=0.0, d=0.0, tabs=0):
@@ -1351,6 +1691,7 @@ class Boxes:
         self.moveTo(x + r_, y, -90)
         self.corner(-360, r, tabs)
 
+    @instanced
     @restore
     @holeCol
     def rectangularHole(self, x, y, dx, dy, r=0, center_x=True, center_y=True):
@@ -1374,6 +1715,7 @@ class Boxes:
             self.corner(-90, r)
             self.edge(d - 2 * r)
 
+    @instanced
     @restore
     @holeCol
     def dHole(self, x, y, r=None, d=None, w=None, rel_w=0.75, angle=0):
@@ -1406,6 +1748,7 @@ class Boxes:
         self.corner(-a)
         self.edge(2*r*math.sin(math.radians(a)))
 
+    @instanced
     @restore
     @holeCol
     def flatHole(self, x, y, r=None, d=None, w=None, rel_w=0.75, angle=0):
@@ -1617,6 +1960,10 @@ class Boxes:
         self.ctx.restore()
 
     def qrcode(self, content: str, box_size: float = 1.0, color=Color.ETCHING, move: str | None = None):
+        import qrcode
+
+        from boxes.qrcode_factory import BoxesQrCodeFactory
+
         q = qrcode.QRCode(image_factory=BoxesQrCodeFactory, box_size=box_size*10)
         q.add_data(content)
         m = q.get_matrix()
@@ -1655,7 +2002,7 @@ class Boxes:
 
     @restore
     @holeCol
-    def fillHoles(self, pattern, border, max_radius, hspace=3, bspace=0, min_radius=0.5, style="round", bar_length=50, max_random=1000):
+    def fillHoles(self, pattern, border, max_radius, hspace=3, bspace=0, min_radius=0.5, style="round", bar_length=50, max_random=1000, seed=None):
         """
         fill a polygon defined by its outline with holes
 
@@ -1667,8 +2014,13 @@ class Boxes:
         :param min_radius:  minimum hole radius
         :param style:       defines hole style - currently one of "round", "triangle", "square", "hexagon" or "octagon"
         :param bar_length:  maximum bar length
-        :param max_random:  maximum number of random holes
+        :param max_random:  maximum number of attempts to place a random hole per 100x100mm
+        :param seed:        seed of the random pattern, fixed for reproducible output if None
         """
+        import shapely
+        from shapely.geometry import LineString, Polygon
+        from shapely.ops import split
+
         if pattern not in ["random", "hex", "square", "hbar", "vbar"]:
             return
 
@@ -1707,7 +2059,6 @@ class Boxes:
                 self.showBorderPoly(border, color=Color.MAGENTA)
 
         row = 0
-        i = 0
 
         # calc the next smaller radius to fit an 'optimum' number of circles
         # for x direction
@@ -1723,50 +2074,11 @@ class Boxes:
             max_radius_y = (max_y - min_y - 2 * bspace - (ny - 1) * hspace) / ny / 2
 
         if pattern == "random":
-            grid = {}
-            misses = 0 # in a row
-            while i < max_random and misses < 20:
-                i += 1
-                misses += 1
-                # random new point
-                x = random.randrange(math.floor(min_x + bspace), math.ceil(max_x - bspace)) # randomness takes longer to compute
-                y = random.randrange(math.floor(min_y + bspace), math.ceil(max_y - bspace)) # but generates a new pattern for each run
-                pt = Point(x, y).buffer(min_radius + bspace)
-                # check if point is within border
-                if borderPoly.contains(pt):
-                    pt1 = Point(x, y)
-                    grid_x = int(x//(2*max_radius+hspace))
-                    grid_y = int(y//(2*max_radius+hspace))
-                    # compute distance between hole and border
-                    bdist = borderPoly.exterior.distance(pt1) - bspace
-                    # compute minimum distance to all other holes
-                    hdist = max_radius
-                    try: # learned from https://medium.com/techtofreedom/5-ways-to-break-out-of-nested-loops-in-python-4c505d34ace7
-                        for gx in (-1, 0, 1):
-                            for gy in (-1, 0, 1):
-                                for pt2 in grid.get((grid_x+gx, grid_y+gy), []):
-                                    pt3 = Point(pt2.x, pt2.y)
-                                    hdist = min(hdist, pt1.distance(pt3) - pt2.z - hspace)
-                                    if hdist < min_radius:
-                                        hdist = 0
-                                        raise StopIteration
-                    except StopIteration:
-                        pass
-                    # find maximum radius depending on distances
-                    r = min(bdist, hdist)
-                    # if too small, dismiss cycle
-                    if r < min_radius:
-                        continue
-                    # if too large, limit to max size
-                    if r > max_radius:
-                        r = max_radius
-                    # store in grid with radius as z value
-                    grid.setdefault((grid_x, grid_y), []).append(
-                        Point(x, y, r))
-                    misses = 0
-                    # and finally paint the hole
-                    self.regularPolygonHole(x, y, r=r, n=n, a=a)
-                    # rinse and repeat
+            if seed is None and self.metadata["reproducible"]:
+                seed = 0
+            for x, y, r in poissonDiskHoles(borderPoly, min_radius, max_radius, hspace, bspace,
+                                            max_random, seed):
+                self.regularPolygonHole(x, y, r=r, n=n, a=a)
 
         elif pattern in ("square", "hex"):
             # use 'optimum' hole size
@@ -1785,6 +2097,8 @@ class Boxes:
             # shrink original polygon to get place for full size polygons
             innerCutPoly = borderPoly.buffer(-1 * (bspace + max_radius - 0.0001), join_style=2)
             innerTestPoly = borderPoly.buffer(-1 * (bspace + max_radius - 0.001), join_style=2)
+            shapely.prepare(outerTestPoly)
+            shapely.prepare(innerTestPoly)
 
             # get left and right boundaries of cut polygon
             x_cpl, y_cpl, x_cpr, y_cpr = outerCutPoly.bounds
@@ -1793,6 +2107,9 @@ class Boxes:
                 self.showBorderPoly(list(outerCutPoly.exterior.coords))
                 self.showBorderPoly(list(innerCutPoly.exterior.coords))
 
+            # centers of the holes, radius None for holes sized by the border distance
+            holes = []
+
             # set startpoint
             y = min_y + bspace + max_radius_y
 
@@ -1809,6 +2126,11 @@ class Boxes:
                 line_complete = LineString([(x_cpl, y), (max_x + 1, y)])
                 inner_line_split = split(line_complete, innerCutPoly)
                 inner_line_index = 0
+                # bounds and containment of all inner lines at once
+                inner_lines = inner_line_split.geoms
+                inner_bounds = shapely.bounds(inner_lines).tolist()
+                inner_contained = shapely.contains(innerTestPoly, inner_lines).tolist()
+                inner_count = len(inner_bounds)
 
                 if self.debug and False:
                     for line in inner_line_split.geoms:
@@ -1838,35 +2160,30 @@ class Boxes:
                     xw = (math.ceil((x_start - xs) / (2 * max_radius_x + hspace)) * (2 * max_radius_x + hspace)) + xs
 
                     # look up matching inner line
-                    while (inner_line_index < len(inner_line_split.geoms) and
-                           (inner_line_split.geoms[inner_line_index].bounds[2] <  xw
-                            or not innerTestPoly.contains(inner_line_split.geoms[inner_line_index]))):
+                    while (inner_line_index < inner_count and
+                           (inner_bounds[inner_line_index][2] <  xw
+                            or not inner_contained[inner_line_index])):
                         inner_line_index += 1
 
                     # and process line
                     while not xw > x_end:
                         # are we in inner polygon already?
-                        if (len(inner_line_split.geoms) > inner_line_index and
-                            xw > inner_line_split.geoms[inner_line_index].bounds[0]):
+                        if (inner_count > inner_line_index and
+                            xw > inner_bounds[inner_line_index][0]):
                             # place inner, full size polygons
-                            while xw < inner_line_split.geoms[inner_line_index].bounds[2]:
-                                self.regularPolygonHole(xw, y, r=max_radius, n=n, a=a)
+                            x_inner_end = inner_bounds[inner_line_index][2]
+                            while xw < x_inner_end:
+                                holes.append((xw, y, max_radius))
                                 xw += (2 * max_radius_x + hspace)
                             # forward to next inner line
-                            while (inner_line_index < len(inner_line_split.geoms) and
-                                   (inner_line_split.geoms[inner_line_index].bounds[0] <  xw
-                                    or not innerTestPoly.contains(inner_line_split.geoms[inner_line_index]))):
+                            while (inner_line_index < inner_count and
+                                   (inner_bounds[inner_line_index][0] <  xw
+                                    or not inner_contained[inner_line_index])):
                                 inner_line_index += 1
                             if xw > x_end:
                                 break
 
-                        # Check distance to border to size the polygon
-                        pt = Point(xw, y)
-                        r = min(borderPoly.exterior.distance(pt) - bspace,
-                                max_radius)
-                        # if too small, dismiss
-                        if r >= min_radius:
-                            self.regularPolygonHole(xw, y, r=r, n=n, a=a)
+                        holes.append((xw, y, None))
                         xw += (2 * max_radius_x + hspace)
 
                 row += 1
@@ -1875,6 +2192,19 @@ class Boxes:
                 else:
                     y += (math.sqrt(3) / 2 * (2 * max_radius_y + hspace)) - 0.0001
 
+            # Check distance to border to size the polygons - all at once
+            border_holes = [(x, y) for x, y, r in holes if r is None]
+            if border_holes:
+                dists = shapely.distance(borderPoly.exterior, shapely.points(border_holes)).tolist()
+                dists.reverse()
+            for x, y, r in holes:
+                if r is None:
+                    r = min(dists.pop() - bspace, max_radius)
+                    # if too small, dismiss
+                    if r < min_radius:
+                        continue
+                self.regularPolygonHole(x, y, r=r, n=n, a=a)
+
         elif pattern == "hbar":
             # 'optimum' hole size to be used
             max_radius = max_radius_y
@@ -2422,6 +2752,7 @@ class Boxes:
 
         self.move(overallwidth, overallheight, move)
 
+    @replayable
     def rectangularWall(self, x, y, edges="eeee",
                         ignore_widths=[],
                         holesMargin=None, holesSettings=None,
@@ -2503,6 +2834,7 @@ class Boxes:
 
         self.move(overallwidth, overallheight, move, label=label)
 
+    @replayable
     def flangedWall(self, x, y, edges="FFFF", flanges=None, r=0.0,
                callback=None, move=None, label=""):
         """Rectangular wall with flanges extending the regular size
@@ -2561,6 +2893,7 @@ class Boxes:
             self.corner(90, rr)
         self.move(tw, th, move, label=label)
 
+    @replayable
     def rectangularTriangle(self, x, y, edges="eee", r=0.0, num=1,
                         bedBolts=None, bedBoltSettings=None,
                         callback=None,
@@ -2636,6 +2969,7 @@ class Boxes:
 
         self.move(overallwidth, overallheight, move, label=label)
 
+    @replayable
     def trapezoidWall(self, w, h0, h1, edges="eeee",
                            callback=None, move=None,
                            label=""):
@@ -2680,6 +3014,7 @@ class Boxes:
 
         self.move(overallwidth, overallheight, move, label=label)
 
+    @replayable
     def trapezoidSideWall(self, w, h0, h1, edges="eeee",
                           radius=0.0, callback=None, move=None,
                           label=""):
@@ -0,0 +1,386 @@
+# Copyright (C) 2013-2014 Florian Festi
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Render benchmark and profiling of the generators
+
+Used by ``boxes --benchmark``. Results are plain dicts that can be saved
+as JSON and compared against a baseline saved earlier. ``boxes
+--benchmark --output-size`` compares the plain and the compact output.
+
+``boxes --profile-render`` uses profileGenerator() to profile a single
+render with the parameters given.
+"""
+from __future__ import annotations
+
+import cProfile
+import gc
+import json
+import platform
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Any
+
+import boxes.generators
+
+PHASES = ("parseArgs", "open", "render", "close")
+
+
+def generators(names=None) -> dict[str, Any]:
+    """Generator infos by class name, all that can render with defaults if no names are given"""
+    result = {}
+    for info in boxes.generators.getGeneratorRegistry().values():
+        name = info.__name__
+        if names:
+            if name.lower() not in {n.lower() for n in names}:
+                continue
+        elif name in boxes.generators.example_skip:
+            continue
+        result.setdefault(name, info)
+    return dict(sorted(result.items()))
+
+
+def renderPhases(cls, fmt: str = "svg") -> tuple[dict[str, float], Any, Any]:
+    """Render once, return the time of each phase, the box and the output"""
+    times = {}
+    box = cls()
+    data = None
+    for phase in PHASES:
+        start = time.perf_counter()
+        if phase == "parseArgs":
+            box.parseArgs(["--format", fmt])
+            box.metadata["reproducible"] = True
+        else:
+            data = getattr(box, phase)()
+        times[phase] = time.perf_counter() - start
+    return times, box, data
+
+
+def benchmarkGenerator(cls, repeat: int = 3, fmt: str = "svg") -> dict[str, Any]:
+    """Best time per phase of repeat renders, peak memory, segments and size"""
+    best = dict.fromkeys(PHASES, float("inf"))
+    gc_enabled = gc.isenabled()
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            times, box, data = renderPhases(cls, fmt)
+        finally:
+            if gc_enabled:
+                gc.enable()
+        for phase in PHASES:
+            best[phase] = min(best[phase], times[phase])
+
+    # extra run as tracing slows down rendering a lot
+    tracemalloc.start()
+    try:
+        renderPhases(cls, fmt)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    result: dict[str, Any] = dict(best)
+    result["total"] = sum(best.values())
+    result["peak_memory"] = peak
+    result["segments"] = box.surface.count
+    result["output_bytes"] = len(data.getvalue())
+    return result
+
+
+def runBenchmark(names=None, repeat: int = 3, fmt: str = "svg", progress=None) -> dict[str, Any]:
+    results = {}
+    for name, info in generators(names).items():
+        if progress:
+            progress(name)
+        results[name] = benchmarkGenerator(info.load(), repeat, fmt)
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "format": fmt,
+        "generators": results,
+    }
+
+
+def compare(results, baseline, threshold: float = 0.2, min_time: float = 0.002) -> list[tuple[str, str, float, float]]:
+    """Return (generator, measure, baseline, new) for all regressions
+
+    A regression is a total time or peak memory more than threshold
+    (relative) above the baseline. Differences of total time below
+    min_time seconds are ignored as noise.
+    """
+    regressions = []
+    old = baseline.get("generators", {})
+    for name, new in results["generators"].items():
+        if name not in old:
+            continue
+        for measure in ("total", "peak_memory"):
+            a, b = old[name][measure], new[measure]
+            if measure == "total" and b - a < min_time:
+                continue
+            if b > a * (1 + threshold):
+                regressions.append((name, measure, a, b))
+    return regressions
+
+
+def formatTable(results, baseline=None) -> str:
+    old = (baseline or {}).get("generators", {})
+    lines = [f"{'generator':<28}" + "".join(f"{p:>10}" for p in PHASES) +
+             f"{'total':>10}{'change':>8}{'memory':>10}{'segments':>10}{'bytes':>10}"]
+    for name, r in sorted(results["generators"].items(), key=lambda i: -i[1]["total"]):
+        change = ""
+        if name in old and old[name]["total"]:
+            change = f"{(r['total'] / old[name]['total'] - 1) * 100:+.0f}%"
+        lines.append(f"{name:<28}" + "".join(f"{r[p] * 1000:>8.1f}ms" for p in PHASES) +
+                     f"{r['total'] * 1000:>8.1f}ms{change:>8}{r['peak_memory'] / 1024:>8.0f}kB"
+                     f"{r['segments']:>10}{r['output_bytes']:>10}")
+    return "\n".join(lines)
+
+
+def outputSizes(cls, fmt: str = "svg", precision: int = 3, repeat: int = 3) -> dict[str, Any]:
+    """Bytes and best time writing the output - plain and compact"""
+    box = cls()
+    box.parseArgs(["--format", fmt])
+    box.metadata["reproducible"] = True
+    box.open()
+    box.render()
+    box.close()
+    result: dict[str, Any] = {}
+    for output, value in (("plain", None), ("compact", precision)):
+        box.surface.precision = value
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            data = box.surface.finish(box.inner_corners)
+            best = min(best, time.perf_counter() - start)
+        result[f"{output}_bytes"] = len(data.getvalue())
+        result[f"{output}_time"] = best
+    return result
+
+
+def runOutputSizes(names=None, fmt: str = "svg", precision: int = 3, repeat: int = 3, progress=None) -> dict[str, Any]:
+    results = {}
+    for name, info in generators(names).items():
+        if progress:
+            progress(name)
+        results[name] = outputSizes(info.load(), fmt, precision, repeat)
+    return {"format": fmt, "precision": precision, "generators": results}
+
+
+def formatOutputTable(results) -> str:
+    lines = [f"{'generator':<28}{'bytes':>10}{'compact':>10}{'size':>8}{'time':>10}{'compact':>10}"]
+    total = dict.fromkeys(("plain_bytes", "compact_bytes", "plain_time", "compact_time"), 0)
+    for name, r in sorted(results["generators"].items(), key=lambda i: -i[1]["plain_bytes"]):
+        for key in total:
+            total[key] += r[key]
+        lines.append(f"{name:<28}{r['plain_bytes']:>10}{r['compact_bytes']:>10}"
+                     f"{r['compact_bytes'] / r['plain_bytes'] * 100:>7.0f}%"
+                     f"{r['plain_time'] * 1000:>8.1f}ms{r['compact_time'] * 1000:>8.1f}ms")
+    if results["generators"]:
+        lines.append(f"{'total':<28}{total['plain_bytes']:>10}{total['compact_bytes']:>10}"
+                     f"{total['compact_bytes'] / total['plain_bytes'] * 100:>7.0f}%"
+                     f"{total['plain_time'] * 1000:>8.1f}ms{total['compact_time'] * 1000:>8.1f}ms")
+    return "\n".join(lines)
+
+
+class DrawingCounters:
+    """Count the drawing calls of a Context
+
+    Wraps the methods of the Context instance - the class stays untouched.
+    """
+    methods = {
+        "line_to": "lines",
+        "arc": "arcs",
+        "arc_negative": "arcs",
+        "curve_to": "curves",
+        "stroke": "strokes",
+        "show_text": "texts",
+        "replay": "replays",
+    }
+
+    def __init__(self, ctx) -> None:
+        self.ctx = ctx
+        self.counts = dict.fromkeys(self.methods.values(), 0)
+        self.counts["saves"] = 0
+        self.counts["max_depth"] = 0
+        for method, name in self.methods.items():
+            setattr(ctx, method, self._counting(getattr(ctx, method), name))
+        ctx.save = self._save(ctx.save)
+
+    def _counting(self, method, name):
+        counts = self.counts
+
+        def counting(*args, **kw):
+            counts[name] += 1
+            return method(*args, **kw)
+        return counting
+
+    def _save(self, method):
+        counts = self.counts
+        stack = self.ctx._stack
+
+        def save():
+            method()
+            counts["saves"] += 1
+            if len(stack) > counts["max_depth"]:
+                counts["max_depth"] = len(stack)
+        return save
+
+    def remove(self) -> None:
+        for method in list(self.methods) + ["save"]:
+            self.ctx.__dict__.pop(method, None)
+
+
+def surfaceCounts(surface) -> dict[str, int]:
+    paths = [path for part in surface.parts for path in part.pathes]
+    return {
+        "parts": len([part for part in surface.parts if part.pathes]),
+        "paths": len(paths),
+        "segments": surface.count,
+        "path_segments": sum(len(path) for path in paths),
+    }
+
+
+class Sampler:
+    """Sample the call stacks of a thread in a background thread"""
+
+    def __init__(self, interval: float = 0.001, thread_id: int | None = None) -> None:
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.frames: dict[tuple[str, str, int], int] = {}
+        self.samples: list[list[int]] = []
+        self.weights: list[float] = []
+        self._thread = None
+        self._running = False
+        self._switchinterval = sys.getswitchinterval()
+
+    def _frame(self, code) -> int:
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        return self.frames.setdefault(key, len(self.frames))
+
+    def _run(self) -> None:
+        last = time.perf_counter()
+        while self._running:
+            time.sleep(self.interval)
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            stack = []
+            while frame is not None:
+                stack.append(self._frame(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                stack.reverse()
+                self.samples.append(stack)
+                self.weights.append(now - last)
+            last = now
+
+    def start(self) -> None:
+        self.samples, self.weights = [], []
+        self._running = True
+        # let the sampling thread get the GIL in time
+        self._switchinterval = sys.getswitchinterval()
+        sys.setswitchinterval(self.interval / 4)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> tuple[list[list[int]], list[float]]:
+        self._running = False
+        self._thread.join()
+        sys.setswitchinterval(self._switchinterval)
+        return self.samples, self.weights
+
+
+def speedscope(name: str, sampler: Sampler, profiles: list[tuple[str, list[list[int]], list[float]]]) -> dict[str, Any]:
+    """Sampled profiles in the speedscope file format"""
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "boxes.py",
+        "shared": {"frames": [{"name": n, "file": f, "line": l} for n, f, l in sampler.frames]},
+        "profiles": [{
+            "type": "sampled",
+            "name": phase,
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        } for phase, samples, weights in profiles],
+    }
+
+
+def profileGenerator(box, args, output: str | None = None, stream=None, top: int = 20) -> Any:
+    """Render box with a profiler running, return the output of close()
+
+    Prints the time of each phase, the drawing counters and the functions
+    taking the most time to stream. output ending in .json is written in
+    the speedscope format and sampled instead of using cProfile - only
+    one profiler runs at a time. Other names are written as pstats dump.
+    The times include the overhead of the profiler used.
+    """
+    stream = stream or sys.stderr
+    times = {}
+    profiles = []
+    stats = None
+    counters = None
+    sampler = Sampler() if output and output.endswith(".json") else None
+    data = None
+    for phase in PHASES:
+        profile = None if sampler else cProfile.Profile()
+        if sampler:
+            sampler.start()
+        start = time.perf_counter()
+        if profile:
+            profile.enable()
+        try:
+            if phase == "parseArgs":
+                box.parseArgs(args)
+            else:
+                data = getattr(box, phase)()
+        finally:
+            if profile:
+                profile.disable()
+            times[phase] = time.perf_counter() - start
+            if sampler:
+                profiles.append((phase,) + sampler.stop())
+        if phase == "open":
+            counters = DrawingCounters(box.ctx)
+        if profile and stats is None:
+            stats = pstats.Stats(profile, stream=stream)
+        elif profile:
+            stats.add(profile)
+    counts = {}
+    if counters:
+        counters.remove()
+        counts.update(counters.counts)
+    counts.update(surfaceCounts(box.surface))
+
+    stream.write(f"Profile of {box.__class__.__name__}\n\n")
+    for phase in PHASES:
+        stream.write(f"{phase:<16}{times[phase] * 1000:>10.1f}ms\n")
+    stream.write(f"{'total':<16}{sum(times.values()) * 1000:>10.1f}ms\n\n")
+    for name, value in counts.items():
+        stream.write(f"{name:<16}{value:>12}\n")
+    stream.write("\n")
+    if stats:
+        stats.sort_stats("cumulative").print_stats(top)
+
+    if output and sampler:
+        with open(output, "w") as f:
+            json.dump(speedscope(box.__class__.__name__, sampler, profiles), f)
+    elif output:
+        stats.dump_stats(output)
+    return data
@@ -1,8 +1,16 @@
 from __future__ import annotations
 
 import codecs
+import datetime
 import io
+import json
 import math
+import struct
+import sys
+import zlib
+from array import array
+from contextlib import contextmanager
+from functools import lru_cache
 from typing import Any
 from xml.etree import ElementTree as ET
 
@@ -16,38 +24,516 @@ PADDING = 10
 RANDOMIZE_COLORS = False  # enable to ease check for continuity of paths
 
 
-def reorder_attributes(root) -> None:
-    """
-    Source: https://docs.python.org/3/library/xml.etree.elementtree.html#xml.etree.ElementTree.Element.remove
-    """
-    for el in root.iter():
-        attrib = el.attrib
-        if len(attrib) > 1:
-            # adjust attribute order, e.g. by sorting
-            attribs = sorted(attrib.items())
-            attrib.clear()
-            attrib.update(attribs)
+def escape_cdata(text: str) -> str:
+    """Escape text content of an XML element"""
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def escape_attrib(text: str) -> str:
+    """Escape an XML attribute value (same as ElementTree)"""
+    text = escape_cdata(text).replace("\"", "&quot;")
+    return text.replace("\r", "&#13;").replace("\n", "&#10;").replace("\t", "&#09;")
+
+
+def xml_start_tag(tag: str, attrib: dict[str, str]) -> str:
+    """Serialize an XML start tag with the attributes in sorted order"""
+    return "<" + tag + "".join(f' {k}="{escape_attrib(v)}"'
+                               for k, v in sorted(attrib.items())) + ">"
+
+
+def xml_element(tag: str, attrib: dict[str, str], text: str | None = None) -> str:
+    """Serialize an XML element without children"""
+    if text:
+        return f"{xml_start_tag(tag, attrib)}{escape_cdata(text)}</{tag}>"
+    return xml_start_tag(tag, attrib)[:-1] + " />"
 
 
 def points_equal(x1, y1, x2, y2):
     return abs(x1 - x2) < EPS and abs(y1 - y2) < EPS
 
 
+@lru_cache(maxsize=8192)
+def format_fixed(n: int, precision: int) -> str:
+    """Shortest decimal of n * 10**-precision, e.g. 1500 -> "1.5", -250 -> "-.25" """
+    sign = "-" if n < 0 else ""
+    i, f = divmod(abs(n), 10 ** precision)
+    f = f"{f:0{precision}d}".rstrip("0") if precision else ""
+    if not f:
+        return f"{sign}{i}"
+    return f"{sign}{i or ''}.{f}"
+
+
+def compact_segments(segments, precision=3):
+    """Simplify the M, L and C segments of a path for compact output
+
+    Consecutive collinear lines are merged and segments vanishing at the
+    given number of decimals are dropped. Yields ("M", x, y) with absolute
+    coordinates, ("L", dx, dy) and ("C", dx1, dy1, dx2, dy2, dx, dy)
+    relative to the current point and ("Z",) for subpaths ending at their
+    start. All values are integers in units of 10**-precision so rounding
+    errors don't add up. Other segments are ignored.
+    """
+    scale = 10 ** precision
+    tol = 0.5 / scale
+    merged: list[Any] = []
+    run: list[Any] = []  # end points of the lines merged into merged[-1]
+    for c in segments:
+        C = c[0]
+        if C not in "MLC":
+            continue
+        if C == "L" and merged:
+            x0, y0 = merged[-1][1:3]
+            if abs(c[1] - x0) <= tol and abs(c[2] - y0) <= tol:
+                continue
+            if merged[-1][0] == "L" and len(merged) > 1:
+                ax, ay = merged[-2][1:3]
+                dx, dy = c[1] - ax, c[2] - ay
+                length = math.hypot(dx, dy)
+                if length > tol and all(
+                        abs((px - ax) * dy - (py - ay) * dx) <= tol * length and
+                        0 < (px - ax) * dx + (py - ay) * dy < length * length
+                        for px, py in run):
+                    merged[-1] = c
+                    run.append(c[1:3])
+                    continue
+            run = [c[1:3]]
+        merged.append(c)
+
+    start = None
+    x = y = 0
+    subpath: list[Any] = []
+    for c in merged + [("M",)]:
+        if c[0] == "M":
+            if subpath:
+                if (x, y) == start[1:]:
+                    if subpath[-1][0] == "L":
+                        subpath.pop()
+                    subpath.append(("Z",))
+                yield start
+                yield from subpath
+                x, y = start[1:]
+                subpath = []
+            if len(c) == 1:
+                break
+            x, y = round(c[1] * scale), round(c[2] * scale)
+            start = ("M", x, y)
+        elif c[0] == "L":
+            x1, y1 = round(c[1] * scale), round(c[2] * scale)
+            if (x1, y1) != (x, y):
+                subpath.append(("L", x1 - x, y1 - y))
+                x, y = x1, y1
+        else:
+            q = [round(v * scale) for v in c[1:]]
+            if q[0:2] != [x, y] or q[2:4] != [x, y] or q[4:6] != [x, y]:
+                subpath.append(("C", q[2] - x, q[3] - y, q[4] - x, q[5] - y, q[0] - x, q[1] - y))
+                x, y = q[0], q[1]
+
+
+def flatten_curve(x0, y0, x1, y1, x2, y2, x3, y3, tolerance=0.1):
+    """Approximate a cubic bezier curve by line segments
+
+    Returns the points after the start point with a maximum deviation
+    of tolerance from the curve.
+    """
+    dd = max(math.hypot(x0 - 2 * x1 + x2, y0 - 2 * y1 + y2),
+             math.hypot(x1 - 2 * x2 + x3, y1 - 2 * y2 + y3))
+    n = max(1, math.ceil(math.sqrt(0.75 * dd / tolerance)))
+    points = []
+    for i in range(1, n):
+        t = i / n
+        mt = 1 - t
+        a, b, c, d = mt * mt * mt, 3 * mt * mt * t, 3 * mt * t * t, t * t * t
+        points.append((a * x0 + b * x1 + c * x2 + d * x3,
+                       a * y0 + b * y1 + c * y2 + d * y3))
+    points.append((x3, y3))
+    return points
+
+
+class EndpointGrid:
+    """Grid of path end points for nearest neighbour searches
+
+    Entries are (x, y, index, reverse) tuples. Entries whose index is
+    marked in used are ignored.
+    """
+
+    def __init__(self, entries, x=0.0, y=0.0) -> None:
+        self.xmin = min(min(e[0] for e in entries), x)
+        self.ymin = min(min(e[1] for e in entries), y)
+        size = max(max(max(e[0] for e in entries), x) - self.xmin,
+                   max(max(e[1] for e in entries), y) - self.ymin)
+        self.cell = max(size, EPS) / max(1.0, math.sqrt(len(entries)))
+        self.max_ring = int(size // self.cell) + 1
+        self.grid: dict[tuple[int, int], list[Any]] = {}
+        for e in entries:
+            self.grid.setdefault(self._cell(e[0], e[1]), []).append(e)
+
+    def _cell(self, x, y):
+        return int((x - self.xmin) // self.cell), int((y - self.ymin) // self.cell)
+
+    def nearest(self, x, y, used):
+        cx, cy = self._cell(x, y)
+        best, best_d = None, float("inf")
+        # (x, y) may be outside of the grid
+        outside = max(0, -cx, -cy, cx - self.max_ring, cy - self.max_ring)
+        for r in range(self.max_ring + outside + 1):
+            if best is not None and best_d <= ((r - 1) * self.cell) ** 2:
+                break
+            for gx in range(cx - r, cx + r + 1):
+                for gy in range(cy - r, cy + r + 1):
+                    if max(abs(gx - cx), abs(gy - cy)) != r:
+                        continue
+                    for e in self.grid.get((gx, gy), ()):
+                        if used[e[2]]:
+                            continue
+                        d = (e[0] - x) ** 2 + (e[1] - y) ** 2
+                        if d < best_d:
+                            best, best_d = e, d
+        return best
+
+
+def two_opt(items, x=0.0, y=0.0, window=50, passes=10):
+    """Shorten travel by reversing runs of paths
+
+    items are (start x, start y, end x, end y, reversible) in travel order
+    starting at (x, y). Only runs of up to window paths that are all
+    reversible are tried. Returns a list of (index, flipped).
+    """
+    seq = [[i, False] for i in range(len(items))]
+
+    def start(k):
+        i, flipped = seq[k]
+        return items[i][2:4] if flipped else items[i][0:2]
+
+    def end(k):
+        i, flipped = seq[k]
+        return items[i][0:2] if flipped else items[i][2:4]
+
+    def dist(p, q):
+        return math.hypot(p[0] - q[0], p[1] - q[1])
+
+    n = len(seq)
+    for _ in range(passes):
+        improved = False
+        for i in range(n):
+            prev = end(i - 1) if i else (x, y)
+            if not items[seq[i][0]][4]:
+                continue
+            before = dist(prev, start(i))
+            for j in range(i + 1, min(n, i + window)):
+                if not items[seq[j][0]][4]:
+                    break
+                if j + 1 < n:
+                    nxt = start(j + 1)
+                    delta = dist(prev, end(j)) + dist(start(i), nxt) - before - dist(end(j), nxt)
+                else:
+                    delta = dist(prev, end(j)) - before
+                if delta < -EPS:
+                    seq[i:j + 1] = [[k, not flipped] for k, flipped in reversed(seq[i:j + 1])]
+                    before = dist(prev, start(i))
+                    improved = True
+        if not improved:
+            break
+    return [tuple(e) for e in seq]
+
+
+def order_paths(items, ends, reverse, x=0.0, y=0.0, rotate=None):
+    """Order items to keep travel moves short
+
+    ends(item) returns (start x, start y, end x, end y, reversible) and
+    reverse(item) the item drawn backwards. If given rotate(item, x, y)
+    returns a closed item starting next to (x, y). Starting at (x, y)
+    always continues with the nearest item, then improves the result
+    with two_opt(). Keeps the original order if that is not longer.
+    Returns the ordered items and the end position.
+    """
+    n = len(items)
+    if n == 0:
+        return [], (x, y)
+    x0, y0 = x, y
+    coords = [ends(item) for item in items]
+
+    entries = []  # (x, y, index, reverse)
+    for i, (sx, sy, ex, ey, reversible) in enumerate(coords):
+        entries.append((sx, sy, i, False))
+        if reversible and not points_equal(sx, sy, ex, ey):
+            entries.append((ex, ey, i, True))
+    grid = EndpointGrid(entries, x, y)
+
+    used = [False] * n
+    order = []  # (item as returned by rotate(), flipped)
+    oriented = []  # ends() in travel direction
+    for _ in range(n):
+        _, _, i, flipped = grid.nearest(x, y, used)
+        used[i] = True
+        item, (sx, sy, ex, ey, reversible) = items[i], coords[i]
+        if flipped:
+            sx, sy, ex, ey = ex, ey, sx, sy
+        elif rotate is not None:
+            item = rotate(item, x, y)
+            sx, sy, ex, ey, reversible = ends(item)
+        order.append((item, flipped))
+        oriented.append((sx, sy, ex, ey, reversible))
+        x, y = ex, ey
+
+    result, result_ends = [], []
+    for k, flipped in two_opt(oriented, x0, y0):
+        sx, sy, ex, ey, reversible = oriented[k]
+        result.append((order[k][0], order[k][1] != flipped))
+        result_ends.append((ex, ey, sx, sy) if flipped else (sx, sy, ex, ey))
+    if travel_length(coords, x0, y0) <= travel_length(result_ends, x0, y0):
+        return list(items), coords[-1][2:4]
+    return ([reverse(item) if flipped else item for item, flipped in result],
+            result_ends[-1][2:4])
+
+
+def travel_length(ends, x=0.0, y=0.0):
+    """Length of the moves starting at (x, y) for (start x, start y, end x, end y, ...) tuples"""
+    length = 0.0
+    for sx, sy, ex, ey, *_ in ends:
+        length += math.hypot(sx - x, sy - y)
+        x, y = ex, ey
+    return length
+
+
 def pdiff(p1, p2):
     x1, y1 = p1
     x2, y2 = p2
     return (x1 - x2, y1 - y2)
 
 
+# position in the cutting order by 4*r + 2*g + b, outer cuts go last
+CUT_ORDER = [4, 3, 0, 1, 2, 2, 2, 2]
+
+
+def cut_rank(rgb) -> int:
+    return CUT_ORDER[4 * int(rgb[0]) + 2 * int(rgb[1]) + int(rgb[2])]
+
+
+class SegmentHash:
+    """Spatial hash of line segments and curves drawn so far
+
+    Lines are hashed by direction, distance from the origin and position
+    along the line. Curves are hashed by their mid point.
+    """
+
+    angle_cell = 0.01  # radians
+
+    def __init__(self, tolerance=0.01, cell=1.0, length_cell=50.0) -> None:
+        self.tolerance = tolerance
+        self.cell = max(cell, 10 * tolerance)
+        self.length_cell = length_cell
+        self.angles = math.ceil(math.pi / self.angle_cell)
+        self.lines: dict[Any, list[Any]] = {}
+        self.curves: dict[Any, list[Any]] = {}
+
+    def _line(self, x0, y0, x1, y1):
+        """Direction cell, distance from origin and positions along the line"""
+        angle = math.atan2(y1 - y0, x1 - x0) % math.pi
+        ux, uy = math.cos(angle), math.sin(angle)
+        return (int(angle // self.angle_cell) % self.angles, uy * x0 - ux * y0,
+                ux * x0 + uy * y0, ux * x1 + uy * y1)
+
+    def add_line(self, key, x0, y0, x1, y1):
+        a, r, s0, s1 = self._line(x0, y0, x1, y1)
+        r = math.floor(r / self.cell)
+        entry = (x0, y0, x1, y1)
+        for p in range(math.floor(min(s0, s1) / self.length_cell),
+                       math.floor(max(s0, s1) / self.length_cell) + 1):
+            self.lines.setdefault((key, a, r, p), []).append(entry)
+
+    def near_lines(self, key, x0, y0, x1, y1):
+        a, r, s0, s1 = self._line(x0, y0, x1, y1)
+        found = {}
+        for da in (-1, 0, 1):
+            # the direction flips when wrapping around
+            sign = 1 if 0 <= a + da < self.angles else -1
+            cr = math.floor(sign * r / self.cell)
+            smin, smax = sorted((sign * s0, sign * s1))
+            for dr in (-1, 0, 1):
+                for p in range(math.floor(smin / self.length_cell),
+                               math.floor(smax / self.length_cell) + 1):
+                    for entry in self.lines.get((key, (a + da) % self.angles, cr + dr, p), ()):
+                        found[entry] = True
+        return found
+
+    def subtract_lines(self, key, x0, y0, x1, y1):
+        """Return the pieces of the line not covered by lines drawn before
+
+        Pieces are (start, end) as distances from (x0, y0).
+        """
+        tol = self.tolerance
+        length = math.hypot(x1 - x0, y1 - y0)
+        ex, ey = (x1 - x0) / length, (y1 - y0) / length
+        covered = []
+        for ax, ay, bx, by in self.near_lines(key, x0, y0, x1, y1):
+            ta = (ax - x0) * ex + (ay - y0) * ey
+            tb = (bx - x0) * ex + (by - y0) * ey
+            u, v = max(0.0, min(ta, tb)), min(length, max(ta, tb))
+            if v - u <= tol:
+                continue
+            # both ends of the overlap need to be on the other line
+            kl = math.hypot(bx - ax, by - ay)
+            if any(abs((x0 + t * ex - ax) * (by - ay) - (y0 + t * ey - ay) * (bx - ax)) > tol * kl
+                   for t in (u, v)):
+                continue
+            covered.append((u, v))
+        pieces = []
+        t = 0.0
+        for u, v in sorted(covered):
+            if u - t > tol:
+                pieces.append((t, u))
+            t = max(t, v)
+        if length - t > tol:
+            pieces.append((t, length))
+        return pieces
+
+    @staticmethod
+    def _curve_mid(points):
+        (x0, y0), (x1, y1), (x2, y2), (x3, y3) = points
+        return (x0 + 3 * x1 + 3 * x2 + x3) / 8, (y0 + 3 * y1 + 3 * y2 + y3) / 8
+
+    def add_curve(self, key, points):
+        x, y = self._curve_mid(points)
+        cell = (key, math.floor(x / self.cell), math.floor(y / self.cell))
+        self.curves.setdefault(cell, []).append(points)
+
+    def has_curve(self, key, points):
+        """Curve with same start, end and control points drawn before"""
+        x, y = self._curve_mid(points)
+        cx, cy = math.floor(x / self.cell), math.floor(y / self.cell)
+        tol = self.tolerance
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for other in self.curves.get((key, cx + dx, cy + dy), ()):
+                    for o in (other, other[::-1]):
+                        if all(abs(p[0] - q[0]) <= tol and abs(p[1] - q[1]) <= tol
+                               for p, q in zip(points, o)):
+                            return True
+        return False
+
+
+def cut_length(path, inner_corners=None):
+    """Length of the lines and curves of a path
+
+    If inner_corners is given the length after Path.faster_edges().
+    """
+    if inner_corners is not None:
+        path = path.copy()
+        path.faster_edges(inner_corners)
+    length = 0.0
+    x, y = 0.0, 0.0
+    for seg in path:
+        C = seg[0]
+        if C == "L":
+            length += math.hypot(seg[1] - x, seg[2] - y)
+        elif C == "C":
+            polyline = [(x, y)] + flatten_curve(x, y, *seg[3:7], *seg[1:3])
+            length += sum(math.dist(p, q) for p, q in zip(polyline, polyline[1:]))
+        elif C == "T":
+            continue
+        x, y = seg[1:3]
+    return length
+
+
+def remove_duplicate_segments(parts, tolerance=0.01, inner_corners=None):
+    """Remove lines and curves that are drawn twice in the same color
+
+    Overlapping portions of collinear lines are removed, curves only if
+    they match as a whole. The segments drawn first are kept. Paths are
+    split where segments got removed. Paths with text and instances of
+    symbols are left untouched. Returns the length of the removed cuts.
+    If inner_corners is given it is measured after Path.faster_edges()
+    - as done when writing - so it matches the output.
+    """
+    segments = SegmentHash(tolerance)
+    removed = 0.0
+    for part in parts:
+        pathes = []
+        changed = False
+        for path in part.pathes:
+            if path.texts or path.symbol is not None:
+                pathes.append(path)
+                continue
+            key = tuple(path.params["rgb"])
+            new: list[Any] = []
+            out = None
+            pen = None
+            x, y = 0.0, 0.0
+            dropped = False
+            for seg in path:
+                C = seg[0]
+                if C == "M":
+                    x, y = seg[1:3]
+                    continue
+                x1, y1 = seg[1:3]
+                keep: list[Any] = []
+                if C == "L":
+                    length = math.hypot(x1 - x, y1 - y)
+                    if length <= tolerance:
+                        keep = [(x, y, seg)]
+                    else:
+                        pieces = segments.subtract_lines(key, x, y, x1, y1)
+                        for u, v in pieces:
+                            if u == 0 and v == length:
+                                keep.append((x, y, seg))
+                            else:
+                                f0, f1 = u / length, v / length
+                                keep.append((x + f0 * (x1 - x), y + f0 * (y1 - y),
+                                             ("L", x + f1 * (x1 - x), y + f1 * (y1 - y))))
+                        for sx, sy, s in keep:
+                            segments.add_line(key, sx, sy, *s[1:3])
+                elif C == "C":
+                    points = ((x, y), seg[3:5], seg[5:7], (x1, y1))
+                    if not segments.has_curve(key, points):
+                        segments.add_curve(key, points)
+                        keep = [(x, y, seg)]
+                if len(keep) != 1 or keep[0][2] is not seg:
+                    dropped = True
+                for sx, sy, s in keep:
+                    if out is None or pen is None or not points_equal(sx, sy, *pen):
+                        out = Path([("M", sx, sy)], dict(path.params))
+                        new.append(out)
+                    out.append(*s)
+                    pen = s[1:3]
+                x, y = x1, y1
+            if dropped:
+                pathes.extend(new)
+                changed = True
+                removed += cut_length(path, inner_corners) - sum(
+                    cut_length(p, inner_corners) for p in new)
+            else:
+                pathes.append(path)
+        if changed:
+            part.pathes = pathes
+            part._ends = {}
+            for n, p in enumerate(pathes):
+                part._add_end(n, p)
+    return removed
+
+
 class Surface:
+    """Collects the stroked paths in parts
+
+    ``symbols`` maps the symbols drawn with Context.replay() to the list
+    of their paths in local coordinates - one entry per stroke, None for
+    empty strokes. Paths drawn as instance of a symbol have their symbol
+    attribute set. Surfaces writing ``instances`` write the symbol paths
+    once and reference them. All other surfaces write the paths as usual.
+
+    SVG and PS surfaces write compact paths with the given number of
+    decimals if ``precision`` is set - see compact_segments().
+    """
 
     scale = 1.0
     invert_y = False
+    instances = False
+    precision = None
 
     def __init__(self) -> None:
         self.parts: list[Any] = []
         self._p = self.new_part("default")
         self.count = 0
+        self.symbols: dict[Any, list[Any]] = {}
 
     def set_metadata(self, metadata):
         self.metadata = metadata
@@ -55,10 +541,22 @@ class Surface:
     def flush(self):
         pass
 
-    def finish(self):
+    def finish(self, inner_corners="loop"):
         pass
 
+    def finish_iter(self, inner_corners="loop"):
+        """Yield the output in chunks of bytes
+
+        Surfaces able to create their output incrementally overload this.
+        """
+        yield self.finish(inner_corners).getvalue()
+
     def _adjust_coordinates(self):
+        """Return the extents and a copy of the parts moved and scaled for output
+
+        The parts of the surface stay untouched so they can be written
+        again - e.g. in another format.
+        """
         extents = self.extents()
         extents.xmin -= PADDING
         extents.ymin -= PADDING
@@ -72,9 +570,11 @@ class Surface:
         else:
             m = Affine.scale(self.scale, self.scale) * m
 
-        self.transform(self.scale, m, self.invert_y)
+        parts = [p.copy() for p in self.parts]
+        for p in parts:
+            p.transform(self.scale, m, self.invert_y)
 
-        return Extents(0, 0, extents.width * self.scale, extents.height * self.scale)
+        return Extents(0, 0, extents.width * self.scale, extents.height * self.scale), parts
 
     def render(self, renderer):
         renderer.init(**self.args)
@@ -100,8 +600,8 @@ class Surface:
             raise ValueError("Too many lines")
         self._p.append(*path)
 
-    def stroke(self, **params):
-        return self._p.stroke(**params)
+    def stroke(self, symbol=None, **params):
+        return self._p.stroke(symbol, **params)
 
     def move_to(self, *xy):
         self._p.move_to(*xy)
@@ -111,126 +611,420 @@ class Surface:
             return Extents()
         return sum([p.extents() for p in self.parts])
 
+    def travel(self):
+        """Length of the moves between all paths"""
+        length, x, y = 0.0, 0.0, 0.0
+        for part in self.parts:
+            for path in part.pathes:
+                sx, sy = path.start()
+                length += math.hypot(sx - x, sy - y)
+                x, y = path.end()
+        return length
+
+    def optimize_order(self):
+        """Reorder and flip paths to reduce travel
+
+        Parts stay in order. Within a part outer cuts come last. Returns
+        the travel length before and after.
+        """
+        before = self.travel()
+        x, y = 0.0, 0.0
+        for part in self.parts:
+            x, y = part.optimize_order(x, y)
+        return before, self.travel()
+
+    def remove_duplicates(self, tolerance=0.01, inner_corners=None):
+        """Remove segments cut twice, return the length removed"""
+        return remove_duplicate_segments(self.parts, tolerance, inner_corners)
+
 
 class Part:
     def __init__(self, name) -> None:
         self.pathes: list[Any] = []
-        self.path: list[Any] = []
+        self.path = Path()
+        # end points of the stroked paths for joining new strokes:
+        # (params, x cell, y cell) -> [(position in pathes, path), ...]
+        self._ends: dict[Any, list[Any]] = {}
 
     def extents(self):
         if not self.pathes:
             return Extents()
         return sum([p.extents() for p in self.pathes])
 
+    def copy(self):
+        """Copy of the stroked pathes"""
+        part = Part.__new__(Part)
+        part.pathes = [p.copy() for p in self.pathes]
+        part.path = Path()
+        part._ends = {}
+        return part
+
     def transform(self, f, m, invert_y=False):
         assert(not self.path)
         for p in self.pathes:
             p.transform(f, m, invert_y)
 
     def append(self, *path):
-        self.path.append(list(path))
-
-    def stroke(self, **params):
+        self.path.append(*path)
+
+    def optimize_order(self, x=0.0, y=0.0):
+        """Reorder pathes to reduce travel starting at (x, y), outer cuts last
+
+        Returns the end position.
+        """
+        groups: dict[bool, list[Any]] = {}
+        for path in self.pathes:
+            # only the outer cut needs to go last
+            groups.setdefault(cut_rank(path.params["rgb"]) == CUT_ORDER[0], []).append(path)
+        pathes = []
+        for rank in sorted(groups):
+            ordered, (x, y) = order_paths(groups[rank], self._path_ends, self._reversed_path, x, y)
+            pathes.extend(ordered)
+        self.pathes = pathes
+        self._ends = {}
+        for n, p in enumerate(pathes):
+            self._add_end(n, p)
+        return x, y
+
+    @staticmethod
+    def _path_ends(path):
+        return (*path.start(), *path.end(), path.reversible())
+
+    @staticmethod
+    def _reversed_path(path):
+        path.reverse()
+        return path
+
+    @staticmethod
+    def _end_key(params, x, y):
+        """Key of the EPS sized grid cell the point is in
+
+        Points considered equal by points_equal() are at most one cell
+        apart. Returns None for points that can't be put on the grid and
+        for unhashable params. Those pathes are not indexed and found by
+        a linear search instead.
+        """
+        try:
+            key = (tuple(sorted(params.items())), int(x // EPS), int(y // EPS))
+            hash(key)
+            return key
+        except (ValueError, OverflowError, TypeError):
+            return None
+
+    def _add_end(self, n, p):
+        key = self._end_key(p.params, *p.end())
+        if key is not None:
+            self._ends.setdefault(key, []).append((n, p))
+
+    def _remove_end(self, n, p):
+        key = self._end_key(p.params, *p.end())
+        if key is not None:
+            self._ends[key].remove((n, p))
+
+    def _find_end(self, x, y, params):
+        """Return (position, path) of the last stroked path ending at x, y"""
+        key = self._end_key(params, x, y)
+        if key is None:
+            for n in range(len(self.pathes) - 1, -1, -1):
+                p = self.pathes[n]
+                if (p.symbol is None and p.params == params and
+                    points_equal(x, y, *p.end())):
+                    return n, p
+            return None
+        params_key, cx, cy = key
+        found = None
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for n, p in self._ends.get((params_key, cx + dx, cy + dy), ()):
+                    if ((found is None or n > found[0]) and
+                        points_equal(x, y, *p.end())):
+                        found = (n, p)
+        return found
+
+    def stroke(self, symbol=None, **params):
         if len(self.path) == 0:
             return
+        if symbol is not None:
+            # instances of symbols are kept as they are
+            p = self.path
+            p.params = params
+            p.symbol = symbol
+            self.pathes.append(p)
+            self.path = Path()
+            return p
         # search for path ending at new start coordinates to append this path to
-        xy0 = self.path[0][1:3]
-        if (not points_equal(*xy0, *self.path[-1][1:3]) and
-            not self.path[0][0] == "T"):
-            for p in reversed(self.pathes):
-                xy1 = p.path[-1][1:3]
-                if points_equal(*xy0, *xy1) and p.params == params:
-                    p.path.extend(self.path[1:])
-                    self.path = []
-                    return p
-        p = Path(self.path, params)
+        xy0 = self.path.start()
+        if (not points_equal(*xy0, *self.path.end()) and
+            not self.path.ops[0] == OP_T):
+            found = self._find_end(*xy0, params)
+            if found:
+                n, p = found
+                self._remove_end(n, p)
+                p.extend(self.path)
+                self._add_end(n, p)
+                self.path = Path()
+                return p
+        p = self.path
+        p.params = params
         self.pathes.append(p)
-        self.path = []
+        self._add_end(len(self.pathes) - 1, p)
+        self.path = Path()
         return p
 
     def move_to(self, *xy):
         if len(self.path) == 0:
-            self.path.append(["M", *xy])
-        elif self.path[-1][0] == "M":
-            self.path[-1] = ["M", *xy]
+            self.path.append("M", *xy)
+        elif self.path.ops[-1] == OP_M:
+            self.path.coords[-2:] = array("d", xy)
         else:
-            xy0 = self.path[-1][1:3]
+            xy0 = self.path.end()
             if not points_equal(*xy0, *xy):
-                self.path.append(["M", *xy])
+                self.path.append("M", *xy)
+
+
+OP_M, OP_L, OP_C, OP_T = b"MLCT"
 
 
 class Path:
-    def __init__(self, path, params) -> None:
-        self.path = path
+    """Sequence of path segments drawn with the same stroke params
+
+    The segments are stored in a compact form: ``ops`` holds one opcode
+    character per segment ("M", "L", "C" or "T") and ``coords`` the
+    coordinates of all segments as one flat float64 buffer. Curves use six
+    values (destination first, then the two control points), all other
+    segments two. Matrix, text and params of text segments are stored
+    separately in ``texts``.
+
+    ``symbol`` is None or (symbol, stroke number, matrix) if the path is
+    an instance of a symbol - see Surface.
+
+    Iterating over a Path yields the segments as tuples, e.g.
+    ``("L", x, y)`` or ``("C", x, y, x1, y1, x2, y2)``.
+    """
+
+    __slots__ = ("ops", "coords", "texts", "params", "symbol")
+
+    def __init__(self, path=(), params=None) -> None:
         self.params = params
+        self.symbol = None
+        self._set_segments(path)
 
     def __repr__(self) -> str:
-        l = len(self.path)
-        # x1,y1 = self.path[0][1:3]
+        l = len(self.ops)
         if l>0:
-            x2, y2 = self.path[-1][1:3]
+            x2, y2 = self.end()
             return f"Path[{l}] to ({x2:.2f},{y2:.2f})"
         return f"empty Path"
 
+    def __len__(self) -> int:
+        return len(self.ops)
+
+    def __iter__(self):
+        coords = self.coords
+        texts = iter(self.texts)
+        i = 0
+        for C in self.ops.decode("ascii"):
+            if C == "C":
+                yield (C, *coords[i:i+6])
+                i += 6
+            elif C == "T":
+                yield (C, coords[i], coords[i+1], *next(texts))
+                i += 2
+            else:
+                yield (C, coords[i], coords[i+1])
+                i += 2
+
+    def _set_segments(self, segments):
+        self.ops = bytearray()
+        self.coords = array("d")
+        self.texts: list[Any] = []
+        for c in segments:
+            self.append(*c)
+
+    def append(self, C, *args):
+        self.ops.append(ord(C))
+        if C == "T":
+            x, y, m, text, params = args
+            self.coords.extend((x, y))
+            self.texts.append((m, text, params))
+        else:
+            self.coords.extend(args)
+
+    def extend(self, path):
+        """Append another path without its leading move"""
+        self.ops.extend(path.ops[1:])
+        self.coords.extend(path.coords[2:])
+        self.texts.extend(path.texts)
+
+    def copy(self):
+        path = Path.__new__(Path)
+        path.ops = bytearray(self.ops)
+        path.coords = array("d", self.coords)
+        path.texts = list(self.texts)
+        path.params = dict(self.params) if self.params is not None else None
+        path.symbol = self.symbol
+        return path
+
+    def reversible(self) -> bool:
+        """Path is a single stroke without text"""
+        return not self.texts and self.ops.count(OP_M) == 1 and self.ops[0] == OP_M
+
+    def reverse(self):
+        """Reverse the direction of a reversible() path"""
+        segments = list(self)
+        new = [("M", *segments[-1][1:3])]
+        for k in range(len(segments) - 1, 0, -1):
+            c = segments[k]
+            x, y = segments[k - 1][1:3]
+            if c[0] == "C":
+                new.append(("C", x, y, c[5], c[6], c[3], c[4]))
+            else:
+                new.append((c[0], x, y))
+        self._set_segments(new)
+
+    def start(self):
+        return self.coords[0], self.coords[1]
+
+    def end(self):
+        if self.ops[-1] == OP_C:
+            return self.coords[-6], self.coords[-5]
+        return self.coords[-2], self.coords[-1]
+
+    def _end_points(self):
+        """x and y coordinates of the end points of all segments"""
+        coords = self.coords
+        if OP_C not in self.ops:
+            return coords[0::2], coords[1::2]
+        xs = array("d")
+        ys = array("d")
+        i = 0
+        for op in self.ops:
+            xs.append(coords[i])
+            ys.append(coords[i+1])
+            i += 6 if op == OP_C else 2
+        return xs, ys
+
     def extents(self):
         e = Extents()
-        for p in self.path:
-            e.add(*p[1:3])
-            if p[0] == 'T':
-                m, text, params = p[3:]
-                h = params['fs']
-                l = len(text) * h * 0.7
-                align = params.get('align', 'left')
-                start, end = {
-                    'left' : (0, 1),
-                    'middle' : (-0.5, 0.5),
-                    'end' : (-1, 0),
-                    }[align]
-                for x in (start*l, end*l):
-                    for y in (0, h):
-                        x_, y_ = m * (x, y)
-                        e.add(x_, y_)
+        if not self.ops:
+            return e
+        xs, ys = self._end_points()
+        e.add(min(xs), min(ys))
+        e.add(max(xs), max(ys))
+        for m, text, params in self.texts:
+            h = params['fs']
+            l = len(text) * h * 0.7
+            align = params.get('align', 'left')
+            start, end = {
+                'left' : (0, 1),
+                'middle' : (-0.5, 0.5),
+                'end' : (-1, 0),
+                }[align]
+            for x in (start*l, end*l):
+                for y in (0, h):
+                    x_, y_ = m * (x, y)
+                    e.add(x_, y_)
         return e
 
     def transform(self, f, m, invert_y=False):
         self.params["lw"] *= f
-        for c in self.path:
-            C = c[0]
-            c[1], c[2] = m * (c[1], c[2])
-            if C == 'C':
-                c[3], c[4] = m * (c[3], c[4])
-                c[5], c[6] = m * (c[5], c[6])
-            if C == "T":
-                c[3] = m * c[3]
+        a, b, c, d, e, f_ = m[:6]
+        xs = self.coords[0::2]
+        ys = self.coords[1::2]
+        # same operation order as Affine.__mul__ to get identical results
+        self.coords[0::2] = array("d", [x * a + y * b + c for x, y in zip(xs, ys)])
+        self.coords[1::2] = array("d", [x * d + y * e + f_ for x, y in zip(xs, ys)])
+        if self.texts:
+            texts = []
+            for tm, text, params in self.texts:
+                tm = m * tm
                 if invert_y:
-                    c[3] *= Affine.scale(1, -1)
+                    tm *= Affine.scale(1, -1)
+                texts.append((tm, text, params))
+            self.texts = texts
+        if self.symbol is not None:
+            symbol, n, sm = self.symbol
+            self.symbol = (symbol, n, tuple(m * Affine(*sm))[:6])
 
     def faster_edges(self, inner_corners):
         if inner_corners == "backarc":
             return
 
-        for (i, p) in enumerate(self.path):
-            if p[0] == "C" and i > 1 and i < len(self.path) - 1:
-                if self.path[i - 1][0] == "L" and self.path[i + 1][0] == "L":
-                    p11 = self.path[i - 2][1:3]
-                    p12 = self.path[i - 1][1:3]
+        path = [list(c) for c in self]
+        for (i, p) in enumerate(path):
+            if p[0] == "C" and i > 1 and i < len(path) - 1:
+                if path[i - 1][0] == "L" and path[i + 1][0] == "L":
+                    p11 = path[i - 2][1:3]
+                    p12 = path[i - 1][1:3]
                     p21 = p[1:3]
-                    p22 = self.path[i + 1][1:3]
+                    p22 = path[i + 1][1:3]
                     if (((p12[0]-p21[0])**2 + (p12[1]-p21[1])**2) >
                         self.params["lw"]**2):
                         continue
                     lines_intersect, x, y = line_intersection((p11, p12), (p21, p22))
                     if lines_intersect:
-                        self.path[i - 1] = ("L", x, y)
+                        path[i - 1] = ("L", x, y)
                         if inner_corners == "loop":
-                            self.path[i] = ("C", x, y, *p12, *p21)
+                            path[i] = ("C", x, y, *p12, *p21)
                         else:
-                            self.path[i] =  ("L", x, y)
+                            path[i] =  ("L", x, y)
         # filter duplicates
-        if len(self.path) > 1: # no need to find duplicates if only one element in path
-            self.path = [p for n, p in enumerate(self.path) if p != self.path[n-1]]
+        if len(path) > 1: # no need to find duplicates if only one element in path
+            path = [p for n, p in enumerate(path) if p != path[n-1]]
+        self._set_segments(path)
+
+def cos_sin_deg(deg):
+    """Cosine and sine of an angle in degrees
+
+    Same as in affine: exact for multiples of 90 degrees.
+    """
+    deg = deg % 360.0
+    if deg == 90.0:
+        return 0.0, 1.0
+    elif deg == 180.0:
+        return -1.0, 0
+    elif deg == 270.0:
+        return 0, -1.0
+    rad = math.radians(deg)
+    return math.cos(rad), math.sin(rad)
+
+
+class Recording:
+    """Surface stand-in storing the drawing of a Context - see Context.record()
+
+    ``calls`` holds ("M", x, y), ("L", x, y), ("C", x, y, x1, y1, x2, y2),
+    ("T", x, y, m, text, params), ("S", params, symbol) for strokes and
+    ("P",) for new parts. ``end`` is the state of the Context afterwards.
+    ``symbols`` are the symbols drawn as in Surface.
+    """
+
+    def __init__(self) -> None:
+        self.calls: list[Any] = []
+        self.end: Any = None
+        self.symbols: dict[Any, list[Any]] = {}
+
+    def move_to(self, x, y):
+        self.calls.append(("M", x, y))
+
+    def append(self, *path):
+        self.calls.append(path)
+
+    def stroke(self, symbol=None, **params):
+        self.calls.append(("S", params, symbol))
+
+    def new_part(self, name="part"):
+        self.calls.append(("P",))
+
 
 class Context:
+    """Cairo like drawing context
+
+    The current transformation is kept as a plain (a, b, c, d, e, f)
+    tuple with the multiplications of Affine inlined. The operations are
+    done in the same order as in Affine.__mul__ to get the very same
+    results - including signed zeros.
+    """
+
     def __init__(self, surface, *al, **ad) -> None:
         self._renderer = self._dwg = surface
 
@@ -238,15 +1032,102 @@ class Context:
         self._padding = PADDING
 
         self._stack: list[Any] = []
-        self._m = Affine.translation(0, 0)
+        self._m = (1.0, 0.0, 0, 0.0, 1.0, 0)
         self._xy = (0, 0)
-        self._mxy = self._m * self._xy
+        self._mxy = self._apply(0, 0)
         self._lw = 0
         self._rgb = (0, 0, 0)
         self._ff = "sans-serif"
         self._fs = 10
         self._last_path = None
 
+    def get_state(self):
+        """Everything but the transformation a drawing may depend on"""
+        return (self._xy, self._lw, self._rgb, self._ff, self._fs)
+
+    @contextmanager
+    def record(self):
+        """Draw into a Recording relative to the current transformation
+
+        Nothing is drawn. Use replay() to draw the Recording - also
+        several times at different positions.
+        """
+        saved = (self._dwg, self._m, self._mxy, len(self._stack))
+        recording = Recording()
+        self._dwg = recording
+        self._m = (1.0, 0.0, 0, 0.0, 1.0, 0)
+        self._mxy = self._apply(*self._xy)
+        try:
+            yield recording
+            if len(self._stack) != saved[3]:
+                raise ValueError("Unbalanced save() and restore() in recording")
+            recording.end = (self._m,) + self.get_state()
+        finally:
+            self._dwg, self._m, self._mxy = saved[:3]
+
+    def replay(self, recording, symbol=None):
+        """Draw a Recording at the current transformation
+
+        Leaves the Context in the same state as drawing directly would.
+        If symbol (any hashable) is given the stroked paths are marked as
+        instances of it and the symbol is added to the surface.
+        """
+        a, b, c, d, e, f = m = self._m
+        dwg = self._dwg
+        for key, paths in recording.symbols.items():
+            dwg.symbols.setdefault(key, paths)
+        definition = None
+        if symbol is not None and symbol not in dwg.symbols:
+            # the recording is in local coordinates already
+            local = Part("symbol")
+            definition = []
+        n = 0
+        for call in recording.calls:
+            C = call[0]
+            if C == "L":
+                x, y = call[1], call[2]
+                dwg.append("L", x * a + y * b + c, x * d + y * e + f)
+            elif C == "M":
+                x, y = call[1], call[2]
+                dwg.move_to(x * a + y * b + c, x * d + y * e + f)
+            elif C == "C":
+                _, x, y, x1, y1, x2, y2 = call
+                dwg.append("C", x * a + y * b + c, x * d + y * e + f,
+                           x1 * a + y1 * b + c, x1 * d + y1 * e + f,
+                           x2 * a + y2 * b + c, x2 * d + y2 * e + f)
+            elif C == "T":
+                _, x, y, tm, text, params = call
+                dwg.append("T", x * a + y * b + c, x * d + y * e + f,
+                           self.get_matrix() * tm, text, params)
+            elif C == "S":
+                instance = call[2]
+                if instance is not None:
+                    key, i, (ma, mb, mc, md, me, mf) = instance
+                    instance = (key, i, (a * ma + b * md, a * mb + b * me, a * mc + b * mf + c,
+                                         d * ma + e * md, d * mb + e * me, d * mc + e * mf + f))
+                elif symbol is not None:
+                    instance = (symbol, n, m)
+                self._last_path = dwg.stroke(instance, **call[1])
+                if definition is not None:
+                    definition.append(local.stroke((symbol, n, None), **call[1]))
+                n += 1
+            else:
+                dwg.new_part()
+            if definition is not None:
+                if C == "M":
+                    local.move_to(call[1], call[2])
+                elif C in "LCT":
+                    local.append(*call)
+        if definition is not None:
+            for path in definition:
+                if path is not None:
+                    path.symbol = None
+            dwg.symbols[symbol] = definition
+        (ma, mb, mc, md, me, mf), self._xy, self._lw, self._rgb, self._ff, self._fs = recording.end
+        self._m = (a * ma + b * md, a * mb + b * me, a * mc + b * mf + c,
+                   d * ma + e * md, d * mb + e * me, d * mc + e * mf + f)
+        self._mxy = self._apply(*self._xy)
+
     def _update_bounds_(self, mx, my):
         self._bounds.update(mx, my)
 
@@ -268,15 +1149,29 @@ class Context:
 
     ## transformations
 
+    def _apply(self, x, y):
+        a, b, c, d, e, f = self._m
+        return (x * a + y * b + c, x * d + y * e + f)
+
+    def get_matrix(self):
+        return Affine(*self._m)
+
     def translate(self, x, y):
-        self._m *= Affine.translation(x, y)
+        a, b, c, d, e, f = self._m
+        self._m = (a + b * 0.0, a * 0.0 + b, a * x + b * y + c,
+                   d + e * 0.0, d * 0.0 + e, d * x + e * y + f)
         self._xy = (0, 0)
 
     def scale(self, sx, sy):
-        self._m *= Affine.scale(sx, sy)
+        a, b, c, d, e, f = self._m
+        self._m = (a * sx + b * 0.0, a * 0.0 + b * sy, a * 0.0 + b * 0.0 + c,
+                   d * sx + e * 0.0, d * 0.0 + e * sy, d * 0.0 + e * 0.0 + f)
 
     def rotate(self, r):
-        self._m *= Affine.rotation(180 * r / math.pi)
+        ca, sa = cos_sin_deg(180 * r / math.pi)
+        a, b, c, d, e, f = self._m
+        self._m = (a * ca + b * sa, a * -sa + b * ca, a * 0.0 + b * 0.0 + c,
+                   d * ca + e * sa, d * -sa + e * ca, d * 0.0 + e * 0.0 + f)
 
     def set_line_width(self, lw):
         self._lw = lw
@@ -290,7 +1185,10 @@ class Context:
         self._add_move()
         x1, y1 = self._mxy
         self._xy = x, y
-        x2, y2 = self._mxy = self._m * self._xy
+        a, b, c, d, e, f = self._m
+        x2 = x * a + y * b + c
+        y2 = x * d + y * e + f
+        self._mxy = (x2, y2)
         if not points_equal(x1, y1, x2, y2):
             self._dwg.append("L", x2, y2)
 
@@ -299,7 +1197,7 @@ class Context:
 
     def move_to(self, x, y):
         self._xy = (x, y)
-        self._mxy = self._m * self._xy
+        self._mxy = self._apply(x, y)
 
     def line_to(self, x, y):
         self._line_to(x, y)
@@ -324,11 +1222,10 @@ class Context:
         x3 = xc + bx + k2 * by
         y3 = yc + by - k2 * bx
 
-        mx1, my1 = self._m * (x1, y1)
-        mx2, my2 = self._m * (x2, y2)
-        mx3, my3 = self._m * (x3, y3)
-        mx4, my4 = self._m * (x4, y4)
-        mxc, myc = self._m * (xc, yc)
+        a, b, c, d, e, f = self._m
+        mx2, my2 = x2 * a + y2 * b + c, x2 * d + y2 * e + f
+        mx3, my3 = x3 * a + y3 * b + c, x3 * d + y3 * e + f
+        mx4, my4 = x4 * a + y4 * b + c, x4 * d + y4 * e + f
 
         self._add_move()
         self._dwg.append("C", mx4, my4, mx2, my2, mx3, my3)
@@ -342,10 +1239,10 @@ class Context:
         self._arc(xc, yc, radius, angle1, angle2, -1)
 
     def curve_to(self, x1, y1, x2, y2, x3, y3):
-        # mx0,my0 = self._m*self._xy
-        mx1, my1 = self._m * (x1, y1)
-        mx2, my2 = self._m * (x2, y2)
-        mx3, my3 = self._m * (x3, y3)
+        a, b, c, d, e, f = self._m
+        mx1, my1 = x1 * a + y1 * b + c, x1 * d + y1 * e + f
+        mx2, my2 = x2 * a + y2 * b + c, x2 * d + y2 * e + f
+        mx3, my3 = x3 * a + y3 * b + c, x3 * d + y3 * e + f
         self._add_move()
         self._dwg.append("C", mx3, my3, mx1, my1, mx2, my2)  # destination first!
         self._xy = (x3, y3)
@@ -371,9 +1268,8 @@ class Context:
     def show_text(self, text, **args):
         params = {"ff": self._ff, "fs": self._fs, "lw": self._lw, "rgb": self._rgb}
         params.update(args)
-        mx0, my0 = self._m * self._xy
-        m = self._m
-        self._dwg.append("T", mx0, my0, m, text, params)
+        mx0, my0 = self._apply(*self._xy)
+        self._dwg.append("T", mx0, my0, self.get_matrix(), text, params)
 
     def text_extents(self, text):
         fs = self._fs
@@ -415,42 +1311,56 @@ class SVGSurface(Surface):
         'monospaced' : '"Courier New", Courier, "Lucida Sans Typewriter"'
     }
 
-    def _addTag(self, parent, tag, text, first=False):
-        if first:
-            t = ET.Element(tag)
-        else:
-            t = ET.SubElement(parent, tag)
-        t.text = text
-        t.tail = '\n'
-        if first:
-            parent.insert(0, t)
-        return t
-
-    def _add_metadata(self, root) -> None:
+    nsmap = {
+        "dc": "http://purl.org/dc/elements/1.1/",
+        "cc": "http://creativecommons.org/ns#",
+        "rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+        "svg": "http://www.w3.org/2000/svg",
+        "xlink": "http://www.w3.org/1999/xlink",
+        "inkscape": "http://www.inkscape.org/namespaces/inkscape",
+    }
+
+    def _metadata(self) -> str:
         md = self.metadata
 
         title = "{group} - {name}".format(**md)
         creation_date: str = md["creation_date"].strftime("%Y-%m-%d %H:%M:%S")
 
-        # Add Inkscape style rdf meta data
-        root.set("xmlns:dc", "http://purl.org/dc/elements/1.1/")
-        root.set("xmlns:cc", "http://creativecommons.org/ns#")
-        root.set("xmlns:rdf", "http://www.w3.org/1999/02/22-rdf-syntax-ns#")
+        # XML comment
+        txt = """\n{name} - {short_description}\n""".format(**md)
+        if md["description"]:
+            txt += """\n\n{description}\n\n""".format(**md)
+        txt += """\nCreated with Boxes.py (https://boxes.hackerspace-bamberg.de/)\n"""
+        if not md["reproducible"]:
+            txt += f"""Creation date: {creation_date}\n"""
+
+        txt += "Command line (remove spaces between dashes): %s\n" % md["cli_short"]
+        if md.get("travel"):
+            txt += "Travel: %.0fmm (%.0fmm before optimization)\n" % (md["travel"][1], md["travel"][0])
+        if md.get("duplicates"):
+            txt += "Duplicate cuts removed: %.0fmm\n" % md["duplicates"]
+
+        if md["url"]:
+            txt += "Url: %s\n" % md["url"]
+            txt += "Url short: %s\n" % md["url_short"]
+            txt += "SettingsUrl: %s\n" % md["url"].replace("&render=1", "")
+            txt += "SettingsUrl short: %s\n" % md["url_short"].replace("&render=1", "")
+        result = ["<!--%s-->\n" % txt.replace("--", "- -").replace("--", "- -")] # ----
 
-        m = self._addTag(root, "metadata", '\n', True)
-        r = ET.SubElement(m, 'rdf:RDF')
-        w = ET.SubElement(r, 'cc:Work')
-        w.text = '\n'
+        # title
+        result.append(xml_element("title", {}, md["name"]) + "\n")
 
-        self._addTag(w, 'dc:title', title)
+        # Inkscape style rdf meta data
+        result.append("<metadata>\n<rdf:RDF><cc:Work>\n")
+        result.append(xml_element("dc:title", {}, title) + "\n")
         if not md["reproducible"]:
-            self._addTag(w, 'dc:date', creation_date)
+            result.append(xml_element("dc:date", {}, creation_date) + "\n")
 
         if "url" in md and md["url"]:
-            self._addTag(w, 'dc:source', md["url"])
-            self._addTag(w, 'dc:source', md["url_short"])
+            result.append(xml_element("dc:source", {}, md["url"]) + "\n")
+            result.append(xml_element("dc:source", {}, md["url_short"]) + "\n")
         else:
-            self._addTag(w, 'dc:source', md["cli"])
+            result.append(xml_element("dc:source", {}, md["cli"]) + "\n")
 
         desc = md["short_description"] or ""
         if "description" in md and md["description"]:
@@ -463,130 +1373,183 @@ class SVGSurface(Surface):
             desc += "Url short: %s\n" % md["url_short"]
             desc += "SettingsUrl: %s\n" % md["url"].replace("&render=1", "")
             desc += "SettingsUrl short: %s\n" % md["url_short"].replace("&render=1", "")
-        self._addTag(w, 'dc:description', desc)
-
-        # title
-        self._addTag(root, "title", md["name"], True)
-
-        # Add XML comment
-        txt = """\n{name} - {short_description}\n""".format(**md)
-        if md["description"]:
-            txt += """\n\n{description}\n\n""".format(**md)
-        txt += """\nCreated with Boxes.py (https://boxes.hackerspace-bamberg.de/)\n"""
-        if not md["reproducible"]:
-            txt += f"""Creation date: {creation_date}\n"""
-
-        txt += "Command line (remove spaces between dashes): %s\n" % md["cli_short"]
-
-        if md["url"]:
-            txt += "Url: %s\n" % md["url"]
-            txt += "Url short: %s\n" % md["url_short"]
-            txt += "SettingsUrl: %s\n" % md["url"].replace("&render=1", "")
-            txt += "SettingsUrl short: %s\n" % md["url_short"].replace("&render=1", "")
-        m = ET.Comment(txt.replace("--", "- -").replace("--", "- -")) # ----
-        m.tail = '\n'
-        root.insert(0, m)
-
-    def finish(self, inner_corners="loop"):
-        extents = self._adjust_coordinates()
+        result.append(xml_element("dc:description", {}, desc) + "\n")
+        result.append("</cc:Work></rdf:RDF></metadata>\n")
+        return "".join(result)
+
+    def _part_elements(self, part, inner_corners, symbol_ids=None):
+        """Yield the <path>, <text> and <use> elements of a part as strings
+
+        Instances of the symbols in symbol_ids are written as <use>.
+        """
+        for j, path in enumerate(part.pathes):
+            if symbol_ids and path.symbol is not None:
+                symbol, n, (a, b, c, d, e, f) = path.symbol
+                yield xml_element("use", {
+                    "xlink:href": f"#s-{symbol_ids[symbol]}-{n}",
+                    "transform": f"matrix({a:.6f} {d:.6f} {b:.6f} {e:.6f} {c:.3f} {f:.3f})",
+                }), "\n  "
+                continue
+            p = []
+            x, y = 0, 0
+            start = None
+            last = None
+            compact = self.precision is not None
+            path.faster_edges(inner_corners)
+            # compact paths are written after the loop, only texts are left
+            for c in (path if not compact or path.texts else ()):
+                x0, y0 = x, y
+                C, x, y = c[0:3]
+                if compact and C != "T":
+                    pass
+                elif C == "M":
+                    if start and points_equal(start[1], start[2],
+                                              last[1], last[2]):
+                        p.append("Z")
+                    start = c
+                    p.append(f"M {x:.3f} {y:.3f}")
+                elif C == "L":
+                    if abs(x - x0) < EPS:
+                        p.append(f"V {y:.3f}")
+                    elif abs(y - y0) < EPS:
+                        p.append(f"H {x:.3f}")
+                    else:
+                        p.append(f"L {x:.3f} {y:.3f}")
+                elif C == "C":
+                    x1, y1, x2, y2 = c[3:]
+                    p.append(
+                        f"C {x1:.3f} {y1:.3f} {x2:.3f} {y2:.3f} {x:.3f} {y:.3f}"
+                    )
+                elif C == "T":
+                    m, text, params = c[3:]
+                    m = m * Affine.translation(0, -params['fs'])
+                    tm = " ".join(f"{m[i]:.3f}" for i in (0, 3, 1, 4, 2, 5))
+                    font, bold, italic = params['ff']
+                    fontweight = ("normal", "bold")[bool(bold)]
+                    fontstyle = ("normal", "italic")[bool(italic)]
+
+                    style = f"font-family: {font} ; font-weight: {fontweight}; font-style: {fontstyle}; fill: {rgb_to_svg_color(*params['rgb'])}"
+                    yield xml_element("text", {
+                        #"x": f"{x:.3f}", "y": f"{y:.3f}",
+                        "transform": f"matrix( {tm} )",
+                        "style": style,
+                        "font-size": f"{params['fs']}px",
+                        "text-anchor": params.get('align', 'left'),
+                        "dominant-baseline": 'hanging',
+                    }, text), ""
+                else:
+                    print("Unknown", c)
+
+                last = c
+
+            if start and start is not last and \
+               points_equal(start[1], start[2], last[1], last[2]):
+                p.append("Z")
+            color = (
+                random_svg_color()
+                if RANDOMIZE_COLORS
+                else rgb_to_svg_color(*path.params["rgb"])
+            )
+            if p and p[-1][0] == "M":
+                p.pop()
+            if compact:
+                d = self._compact_data(path)
+                p = [d] if d else []
+            if p:  # might be empty if only contains text
+                yield xml_element("path", {
+                    "d": " ".join(p),
+                    "stroke": color,
+                    "stroke-width": f'{path.params["lw"]:.2f}',
+                }), "\n  "
+
+    def _compact_data(self, path) -> str:
+        """Path data with relative commands and numbers as short as possible"""
+        precision = self.precision
+        d = []
+        for c in compact_segments(path, precision):
+            C = c[0]
+            if C == "Z":
+                d.append("z")
+                continue
+            if C == "L":
+                C = "l"
+                if c[1] == 0:
+                    C, c = "v", c[1:]
+                elif c[2] == 0:
+                    C, c = "h", c[:2]
+            elif C == "C":
+                C = "c"
+            numbers = [format_fixed(n, precision) for n in c[1:]]
+            d.append(C + numbers[0] + "".join(n if n[0] == "-" else " " + n for n in numbers[1:]))
+        return "".join(d)
+
+    def _defs(self, inner_corners):
+        """<defs> with the paths of the symbols and their ids"""
+        symbol_ids = {}
+        defs = ["<defs>\n"]
+        for i, (symbol, paths) in enumerate(self.symbols.items()):
+            symbol_ids[symbol] = i
+            for n, path in enumerate(paths):
+                if path is None:
+                    continue
+                part = Part("symbol")
+                # in local coordinates - scaled by the transformation of <use>
+                part.pathes = [path.copy()]
+                defs.append(xml_start_tag("g", {"id": f"s-{i}-{n}"}))
+                defs.extend(element for element, _ in self._part_elements(part, inner_corners))
+                defs.append("</g>\n")
+        defs.append("</defs>\n")
+        return "".join(defs), symbol_ids
+
+    def finish_iter(self, inner_corners="loop"):
+        """Yield the SVG document in chunks of bytes - one per part
+
+        With instances set the symbols are written to <defs> once and
+        their instances as <use> elements.
+        """
+        extents, parts = self._adjust_coordinates()
         w = extents.width * self.scale
         h = extents.height * self.scale
 
-
-        nsmap = {
-                "dc": "http://purl.org/dc/elements/1.1/",
-                "cc": "http://creativecommons.org/ns#",
-                "rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
-                "svg": "http://www.w3.org/2000/svg",
-                "xlink": "http://www.w3.org/1999/xlink",
-                "inkscape": "http://www.inkscape.org/namespaces/inkscape",
-            }
-        ET.register_namespace("", "http://www.w3.org/2000/svg")
-        ET.register_namespace("xlink", "http://www.w3.org/1999/xlink")
-        svg = ET.Element('svg', width=f"{w:.2f}mm", height=f"{h:.2f}mm",
-                         viewBox=f"0.0 0.0 {w:.2f} {h:.2f}",
-                         xmlns="http://www.w3.org/2000/svg")
-        for name, value in nsmap.items():
-            svg.set(f"xmlns:{name}", value)
-        svg.text = "\n"
-        tree = ET.ElementTree(svg)
-
-        self._add_metadata(svg)
-
-        for i, part in enumerate(self.parts):
+        attrib = {
+            "width": f"{w:.2f}mm",
+            "height": f"{h:.2f}mm",
+            "viewBox": f"0.0 0.0 {w:.2f} {h:.2f}",
+            "xmlns": "http://www.w3.org/2000/svg",
+        }
+        for name, value in self.nsmap.items():
+            attrib[f"xmlns:{name}"] = value
+        header = ["<?xml version='1.0' encoding='utf-8'?>\n",
+                  xml_start_tag("svg", attrib), "\n", self._metadata()]
+        symbol_ids = None
+        if self.instances and self.symbols:
+            defs, symbol_ids = self._defs(inner_corners)
+            header.append(defs)
+        yield "".join(header).encode("utf-8")
+
+        for i, part in enumerate(parts):
             if not part.pathes:
                 continue
-            g = ET.SubElement(svg, "g", id=f"p-{i}",
-                              style="fill:none;stroke-linecap:round;stroke-linejoin:round;")
-            g.text = "\n  "
-            g.tail = "\n"
-            for j, path in enumerate(part.pathes):
-                p = []
-                x, y = 0, 0
-                start = None
-                last = None
-                path.faster_edges(inner_corners)
-                for c in path.path:
-                    x0, y0 = x, y
-                    C, x, y = c[0:3]
-                    if C == "M":
-                        if start and points_equal(start[1], start[2],
-                                                  last[1], last[2]):
-                            p.append("Z")
-                        start = c
-                        p.append(f"M {x:.3f} {y:.3f}")
-                    elif C == "L":
-                        if abs(x - x0) < EPS:
-                            p.append(f"V {y:.3f}")
-                        elif abs(y - y0) < EPS:
-                            p.append(f"H {x:.3f}")
-                        else:
-                            p.append(f"L {x:.3f} {y:.3f}")
-                    elif C == "C":
-                        x1, y1, x2, y2 = c[3:]
-                        p.append(
-                            f"C {x1:.3f} {y1:.3f} {x2:.3f} {y2:.3f} {x:.3f} {y:.3f}"
-                        )
-                    elif C == "T":
-                        m, text, params = c[3:]
-                        m = m * Affine.translation(0, -params['fs'])
-                        tm = " ".join(f"{m[i]:.3f}" for i in (0, 3, 1, 4, 2, 5))
-                        font, bold, italic = params['ff']
-                        fontweight = ("normal", "bold")[bool(bold)]
-                        fontstyle = ("normal", "italic")[bool(italic)]
-
-                        style = f"font-family: {font} ; font-weight: {fontweight}; font-style: {fontstyle}; fill: {rgb_to_svg_color(*params['rgb'])}"
-                        t = ET.SubElement(g, "text",
-                                          #x=f"{x:.3f}", y=f"{y:.3f}",
-                                          transform=f"matrix( {tm} )",
-                                          style=style)
-                        t.text = text
-                        t.set("font-size", f"{params['fs']}px")
-                        t.set("text-anchor", params.get('align', 'left'))
-                        t.set("dominant-baseline", 'hanging')
-                    else:
-                        print("Unknown", c)
-
-                    last = c
+            g = [xml_start_tag("g", {
+                "id": f"p-{i}",
+                "style": "fill:none;stroke-linecap:round;stroke-linejoin:round;"}),
+                 "\n  "]
+            element = None
+            for next_element in self._part_elements(part, inner_corners, symbol_ids):
+                if element:
+                    g.extend(element)
+                element = next_element
+            if element:
+                # last element of the group
+                g.extend((element[0], "\n"))
+            g.append("</g>\n")
+            yield "".join(g).encode("utf-8")
+        yield b"</svg>"
 
-                if start and start is not last and \
-                   points_equal(start[1], start[2], last[1], last[2]):
-                    p.append("Z")
-                color = (
-                    random_svg_color()
-                    if RANDOMIZE_COLORS
-                    else rgb_to_svg_color(*path.params["rgb"])
-                )
-                if p and p[-1][0] == "M":
-                    p.pop()
-                if p:  # might be empty if only contains text
-                    t = ET.SubElement(g, "path", d=" ".join(p), stroke=color)
-                    t.set("stroke-width", f'{path.params["lw"]:.2f}')
-                    t.tail = "\n  "
-            t.tail = "\n"
-        reorder_attributes(tree)
+    def finish(self, inner_corners="loop"):
         f = io.BytesIO()
-        tree.write(f, encoding="utf-8", xml_declaration=True, method="xml")
+        for chunk in self.finish_iter(inner_corners):
+            f.write(chunk)
         f.seek(0)
         return f
 
@@ -630,6 +1593,10 @@ class PSSurface(Surface):
 
         desc += "%% Command line: %s\n" % md["cli"]
         desc += "%% Command line short: %s\n" % md["cli_short"]
+        if md.get("travel"):
+            desc += "%% Travel: %.0fmm (%.0fmm before optimization)\n" % (md["travel"][1], md["travel"][0])
+        if md.get("duplicates"):
+            desc += "%% Duplicate cuts removed: %.0fmm\n" % md["duplicates"]
         if md["url"]:
             desc += f'%%Url: {md["url"]}\n'
             desc += f'%%Url short: {md["url_short"]}\n'
@@ -637,9 +1604,15 @@ class PSSurface(Surface):
             desc += f'%%SettingsUrl short: {md["url_short"].replace("&render=1", "")}\n'
         return desc
 
+    def _compact_ops(self, path) -> list[str]:
+        """Path operators with relative coordinates and short numbers"""
+        ops = {"M": "moveto", "L": "rlineto", "C": "rcurveto", "Z": "closepath"}
+        return [" ".join([format_fixed(n, self.precision) for n in c[1:]] + [ops[c[0]]])
+                for c in compact_segments(path, self.precision)]
+
     def finish(self, inner_corners="loop"):
 
-        extents = self._adjust_coordinates()
+        extents, parts = self._adjust_coordinates()
         w = extents.width
         h = extents.height
 
@@ -675,18 +1648,23 @@ class PSSurface(Surface):
         # dwg['width']=f'{w:.2f}mm'
         # dwg['height']=f'{h:.2f}mm'
 
-        for i, part in enumerate(self.parts):
+        for i, part in enumerate(parts):
             if not part.pathes:
                 continue
             for j, path in enumerate(part.pathes):
                 p = []
                 x, y = 0, 0
+                compact = self.precision is not None
                 path.faster_edges(inner_corners)
+                if compact:
+                    p = self._compact_ops(path)
 
-                for c in path.path:
+                for c in (path if not compact or path.texts else ()):
                     x0, y0 = x, y
                     C, x, y = c[0:3]
-                    if C == "M":
+                    if compact and C != "T":
+                        pass
+                    elif C == "M":
                         p.append(f"{x:.3f} {y:.3f} moveto")
                     elif C == "L":
                         p.append(f"{x:.3f} {y:.3f} lineto")
@@ -772,7 +1750,7 @@ class LBRN2Surface(Surface):
 
     def finish(self, inner_corners="loop"):
         if self.dbg: print("LBRN2 save")
-        extents = self._adjust_coordinates()
+        extents, parts = self._adjust_coordinates()
         w = extents.width * self.scale
         h = extents.height * self.scale
 
@@ -824,7 +1802,7 @@ class LBRN2Surface(Surface):
         name     = ET.SubElement(cs, "name",     Value="T1")        # tool layer do not support names
         priority = ET.SubElement(cs, "priority", Value="7")         # is not cut at all
 
-        for i, part in enumerate(self.parts):
+        for i, part in enumerate(parts):
             if self.dbg: print ("7", num)
             if not part.pathes:
                 continue
@@ -844,23 +1822,24 @@ class LBRN2Surface(Surface):
                 start = None
                 last = None
                 path.faster_edges(inner_corners)
+                segments = list(path)
                 num = 0
                 cnt = 1
-                end = len(path.path) - 1
+                end = len(segments) - 1
                 if self.dbg:
-                    for c in path.path:
+                    for c in segments:
                         print ("6",num, c)
                         num += 1
                     num = 0
 
-                c = path.path[num]
+                c = segments[num]
                 C, x, y = c[0:3]
                 if self.dbg:
                     print("end:", end)
-                while num < end or (C == "T" and num <= end):  # len(path.path):
+                while num < end or (C == "T" and num <= end):  # len(segments):
                     if self.dbg:
                         print("0", num)
-                    c = path.path[num]
+                    c = segments[num]
                     if self.dbg: print("first: ", num, c)
 
                     C, x, y = c[0:3]
@@ -880,9 +1859,9 @@ class LBRN2Surface(Surface):
                         # do something with M
                         done = False
                         bspline = False
-                        while done == False and num < end:  # len(path.path):
+                        while done == False and num < end:  # len(segments):
                             num += 1
-                            c = path.path[num]
+                            c = segments[num]
                             if self.dbg: print ("next: ",num, c)
                             C, x, y = c[0:3]
                             if C == "M":
@@ -1002,6 +1981,397 @@ class LBRN2Surface(Surface):
         f.seek(0)
         return f
 
+
+class PolylineSurface(Surface):
+    """Base for formats that only know straight lines
+
+    Curves are approximated by polylines deviating at most flatness mm.
+    """
+
+    flatness = 0.1
+
+    # (name, AutoCAD color index) by 4*r + 2*g + b
+    layers = [
+        ("OUTER_CUT", 7),
+        ("INNER_CUT", 5),
+        ("ETCHING", 3),
+        ("ETCHING_DEEP", 4),
+        ("ANNOTATIONS", 1),
+        ("MAGENTA", 6),
+        ("YELLOW", 2),
+        ("WHITE", 9),
+    ]
+
+    @staticmethod
+    def _layer_index(rgb) -> int:
+        return 4 * int(rgb[0]) + 2 * int(rgb[1]) + int(rgb[2])
+
+    def _layer(self, rgb) -> str:
+        return self.layers[self._layer_index(rgb)][0]
+
+    def _polylines(self, path, inner_corners):
+        """List of polylines (lists of points) of a path, ignoring text"""
+        path.faster_edges(inner_corners)
+        polylines = []
+        points: list[tuple[float, float]] = []
+        tolerance = self.flatness * self.scale
+        for c in path:
+            C, x, y = c[0:3]
+            if C == "M":
+                if len(points) > 1:
+                    polylines.append(points)
+                points = [(x, y)]
+            elif C == "L":
+                points.append((x, y))
+            elif C == "C":
+                x0, y0 = points[-1]
+                points.extend(flatten_curve(x0, y0, *c[3:7], x, y, tolerance))
+        if len(points) > 1:
+            polylines.append(points)
+        return polylines
+
+    @staticmethod
+    def _polyline_ends(points):
+        return (*points[0], *points[-1], True)
+
+    @staticmethod
+    def _reversed_polyline(points):
+        return points[::-1]
+
+    @staticmethod
+    def _rotated_polyline(points, x, y):
+        """Closed polyline starting at the point nearest to (x, y)"""
+        if len(points) > 2 and points_equal(*points[0], *points[-1]):
+            j = min(range(len(points) - 1),
+                    key=lambda k: (points[k][0] - x) ** 2 + (points[k][1] - y) ** 2)
+            if j:
+                return points[j:-1] + points[:j + 1]
+        return points
+
+    def _ordered_polylines(self, parts, inner_corners, skip=()):
+        """Yield (params, points) in cutting order
+
+        Part by part, etchings first and outer cuts last. Within each
+        layer the polylines are ordered to reduce travel.
+        """
+        x, y = 0.0, 0.0
+        for part in parts:
+            layers: dict[int, list[Any]] = {}
+            for path in part.pathes:
+                index = self._layer_index(path.params["rgb"])
+                if self.layers[index][0] in skip:
+                    continue
+                layers.setdefault(index, []).extend(
+                    (path.params, points) for points in self._polylines(path, inner_corners))
+            for index in sorted(layers, key=lambda i: (CUT_ORDER[i], i)):
+                entries = layers[index]
+                params = [p for p, _ in entries]
+                ordered, (x, y) = order_paths([points for _, points in entries], self._polyline_ends,
+                                              self._reversed_polyline, x, y, self._rotated_polyline)
+                # params only differ in line width which is not used
+                yield from zip(params, ordered)
+
+
+class DXFSurface(PolylineSurface):
+    """Writes AutoCAD R12 DXF with one layer per color
+
+    Curves are approximated by polylines.
+    """
+
+    fonts = {
+        'serif': 'times.ttf',
+        'sans-serif': 'arial.ttf',
+        'monospaced': 'cour.ttf',
+    }
+
+    @staticmethod
+    def _text(text: str) -> str:
+        return "".join(c if 32 <= ord(c) < 127 else f"\\U+{ord(c):04X}" for c in text)
+
+    def _metadata(self) -> list[str]:
+        md = self.metadata
+        lines = ["Boxes.py - {group} - {name}".format(**md)]
+        if not md["reproducible"]:
+            lines.append(f'Creation date: {md["creation_date"].strftime("%Y-%m-%d %H:%M:%S")}')
+        lines.append("Command line: %s" % md["cli"])
+        if md["url"]:
+            lines.append("Url: %s" % md["url"])
+        return [line for l in lines for line in l.split("\n")]
+
+    def _polyline(self, out, layer, points):
+        if len(points) < 2:
+            return
+        if len(points) == 2:
+            (x1, y1), (x2, y2) = points
+            out.append(f"  0\nLINE\n  8\n{layer}\n 10\n{x1:.4f}\n 20\n{y1:.4f}\n 11\n{x2:.4f}\n 21\n{y2:.4f}\n")
+            return
+        closed = 0
+        if points_equal(*points[0], *points[-1]):
+            points = points[:-1]
+            closed = 1
+        out.append(f"  0\nPOLYLINE\n  8\n{layer}\n 66\n1\n 10\n0.0\n 20\n0.0\n 70\n{closed}\n")
+        for x, y in points:
+            out.append(f"  0\nVERTEX\n  8\n{layer}\n 10\n{x:.4f}\n 20\n{y:.4f}\n")
+        out.append(f"  0\nSEQEND\n  8\n{layer}\n")
+
+    def finish(self, inner_corners="loop"):
+        extents, parts = self._adjust_coordinates()
+
+        out = [f"999\n{line}\n" for line in self._metadata()]
+        out.append(f"""  0\nSECTION\n  2\nHEADER
+  9\n$ACADVER\n  1\nAC1009
+  9\n$INSUNITS\n 70\n4
+  9\n$EXTMIN\n 10\n0.0\n 20\n0.0
+  9\n$EXTMAX\n 10\n{extents.width:.4f}\n 20\n{extents.height:.4f}
+  0\nENDSEC
+  0\nSECTION\n  2\nTABLES
+  0\nTABLE\n  2\nLTYPE\n 70\n1
+  0\nLTYPE\n  2\nCONTINUOUS\n 70\n0\n  3\nSolid line\n 72\n65\n 73\n0\n 40\n0.0
+  0\nENDTAB
+  0\nTABLE\n  2\nLAYER\n 70\n{len(self.layers)}
+""")
+        for name, color in self.layers:
+            out.append(f"  0\nLAYER\n  2\n{name}\n 70\n0\n 62\n{color}\n  6\nCONTINUOUS\n")
+        out.append("  0\nENDTAB\n  0\nTABLE\n  2\nSTYLE\n 70\n3\n")
+        for font, fn in self.fonts.items():
+            out.append(f"  0\nSTYLE\n  2\n{font}\n 70\n0\n 40\n0.0\n 41\n1.0\n 50\n0.0\n 71\n0\n 42\n1.0\n  3\n{fn}\n  4\n\n")
+        out.append("  0\nENDTAB\n  0\nENDSEC\n  0\nSECTION\n  2\nENTITIES\n")
+
+        for part in parts:
+            for path in part.pathes:
+                layer = self._layer(path.params["rgb"])
+                for points in self._polylines(path, inner_corners):
+                    self._polyline(out, layer, points)
+                for m, text, params in path.texts:
+                    halign = {"middle": 1, "end": 2}.get(params.get("align", "left"), 0)
+                    height = params["fs"] * math.hypot(m[0], m[3])
+                    angle = math.degrees(math.atan2(m[3], m[0]))
+                    out.append(f"  0\nTEXT\n  8\n{self._layer(params['rgb'])}\n 10\n{m[2]:.4f}\n 20\n{m[5]:.4f}\n"
+                               f" 40\n{height:.4f}\n  1\n{self._text(text)}\n 50\n{angle:.4f}\n"
+                               f"  7\n{params['ff'][0]}\n 72\n{halign}\n 11\n{m[2]:.4f}\n 21\n{m[5]:.4f}\n 73\n1\n")
+
+        out.append("  0\nENDSEC\n  0\nEOF\n")
+        data = io.BytesIO("".join(out).encode("ascii", "replace"))
+        return data
+
+
+
+class HPGLSurface(PolylineSurface):
+    """Writes HP-GL with one pen per color in cutting order"""
+
+    units = 40  # plotter units per mm
+
+    def finish(self, inner_corners="loop"):
+        extents, parts = self._adjust_coordinates()
+        u = self.units
+        out = ["IN;\n"]
+        pen = None
+        for params, points in self._ordered_polylines(parts, inner_corners, skip=("ANNOTATIONS",)):
+            index = self._layer_index(params["rgb"]) + 1
+            if index != pen:
+                pen = index
+                out.append(f"SP{pen};\n")
+            x, y = points[0]
+            out.append(f"PU{x * u:.0f},{y * u:.0f};\n")
+            out.append("PD" + ",".join(f"{x * u:.0f},{y * u:.0f}" for x, y in points[1:]) + ";\n")
+        out.append("PU;\nSP0;\n")
+        return io.BytesIO("".join(out).encode("ascii"))
+
+
+class GCodeSurface(PolylineSurface):
+    """Writes G-code for laser cutters
+
+    The laser is switched on with M3 for each polyline and off with M5
+    for travel moves. Annotations are left out.
+    """
+
+    feed = 1000  # mm/min
+    power = 1000  # spindle value S
+
+    def finish(self, inner_corners="loop"):
+        extents, parts = self._adjust_coordinates()
+        md = self.metadata
+        out = [f"; Boxes.py - {md['group']} - {md['name']}\n"]
+        out.extend(f"; {line}\n" for line in ("Command line: " + md["cli"]).split("\n"))
+        if md.get("travel"):
+            out.append("; Travel: %.0fmm (%.0fmm before optimization)\n" % (md["travel"][1], md["travel"][0]))
+        if md.get("duplicates"):
+            out.append("; Duplicate cuts removed: %.0fmm\n" % md["duplicates"])
+        out.append("G21\nG90\nM5\n")
+        layer = None
+        for params, points in self._ordered_polylines(parts, inner_corners, skip=("ANNOTATIONS",)):
+            if self._layer(params["rgb"]) != layer:
+                layer = self._layer(params["rgb"])
+                out.append(f"; {layer}\n")
+            x, y = points[0]
+            out.append(f"G0 X{x:.3f} Y{y:.3f}\nM3 S{self.power}\n")
+            out.append(f"G1 F{self.feed}\n")
+            out.extend(f"G1 X{x:.3f} Y{y:.3f}\n" for x, y in points[1:])
+            out.append("M5\n")
+        out.append("G0 X0 Y0\nM2\n")
+        return io.BytesIO("".join(out).encode("utf-8"))
+
+
+def _tuples(value):
+    """Turn the lists of decoded JSON back into tuples"""
+    if isinstance(value, list):
+        return tuple(_tuples(v) for v in value)
+    if isinstance(value, dict):
+        return {k: _tuples(v) for k, v in value.items()}
+    return value
+
+
+class BXGSurface(Surface):
+    """Writes the drawing in the compact binary bxg format
+
+    The geometry is stored as rendered - before any format specific
+    adjustments - so it can be written in any other format later with
+    load(). After the magic b"BXG1" follows the zlib compressed drawing.
+    All numbers are little endian:
+
+      uint32 n, n bytes UTF-8 JSON header with "metadata",
+          "inner_corners", "instances", "precision" and "params" - a
+          list of all stroke and text params referenced by index below
+      uint32 number of parts, per part:
+        uint32 number of pathes, followed by the pathes
+      uint32 number of symbols, per symbol:
+        uint32 number of strokes, per stroke:
+          uint8 0 for an empty stroke, 1 followed by the path
+
+    A path is stored as:
+
+      uint32 params index, number of segments, coords and texts
+      uint32 symbol: 0 for none, symbol number + 1 for an instance -
+          followed by uint32 stroke number and 6 float64 matrix
+      one opcode byte per segment (M, L, C or T)
+      float64 coords as in Path.coords
+      per text: 6 float64 matrix, uint32 params index,
+          uint32 n, n bytes UTF-8 text
+
+    The symbols are numbered in the order they are stored in.
+    """
+
+    magic = b"BXG1"
+
+    def finish(self, inner_corners="loop"):
+        index: dict[str, int] = {}
+        params: list[Any] = []
+        symbols = {symbol: i for i, symbol in enumerate(self.symbols)}
+
+        def param_index(p):
+            key = json.dumps(p)
+            if key not in index:
+                index[key] = len(params)
+                params.append(p)
+            return index[key]
+
+        def write_path(path):
+            coords = path.coords
+            if sys.byteorder == "big":
+                coords = array("d", coords)
+                coords.byteswap()
+            out.append(struct.pack("<4I", param_index(path.params), len(path.ops),
+                                   len(coords), len(path.texts)))
+            if path.symbol is None:
+                out.append(struct.pack("<I", 0))
+            else:
+                symbol, n, m = path.symbol
+                out.append(struct.pack("<2I6d", symbols[symbol] + 1, n, *m))
+            out.append(bytes(path.ops))
+            out.append(coords.tobytes())
+            for m, text, text_params in path.texts:
+                text = text.encode("utf-8")
+                out.append(struct.pack("<6d2I", *m[:6], param_index(text_params), len(text)))
+                out.append(text)
+
+        out = [struct.pack("<I", len(self.parts))]
+        for part in self.parts:
+            out.append(struct.pack("<I", len(part.pathes)))
+            for path in part.pathes:
+                write_path(path)
+        out.append(struct.pack("<I", len(self.symbols)))
+        for paths in self.symbols.values():
+            out.append(struct.pack("<I", len(paths)))
+            for path in paths:
+                if path is None:
+                    out.append(b"\0")
+                else:
+                    out.append(b"\1")
+                    write_path(path)
+        header = json.dumps({
+            "metadata": self.metadata,
+            "inner_corners": inner_corners,
+            "instances": self.instances,
+            "precision": self.precision,
+            "params": params,
+        }, default=str).encode("utf-8")
+        data = struct.pack("<I", len(header)) + header + b"".join(out)
+        return io.BytesIO(self.magic + zlib.compress(data))
+
+    @classmethod
+    def load(cls, data, surface):
+        """Fill surface with the drawing of a bxg file
+
+        The symbols are numbered starting with 0. Returns the
+        inner_corners setting to pass to surface.finish().
+        """
+        data = bytes(data)
+        if data[:4] != cls.magic:
+            raise ValueError("Not a bxg file")
+        data = zlib.decompress(data[4:])
+        n, = struct.unpack_from("<I", data)
+        header = json.loads(data[4:4+n])
+        params = [_tuples(p) for p in header["params"]]
+        pos = 4 + n
+
+        def read(fmt):
+            nonlocal pos
+            values = struct.unpack_from(fmt, data, pos)
+            pos += struct.calcsize(fmt)
+            return values
+
+        def read_path():
+            nonlocal pos
+            p, n_ops, n_coords, n_texts = read("<4I")
+            path = Path(params=dict(params[p]) if params[p] is not None else None)
+            symbol, = read("<I")
+            if symbol:
+                n, *m = read("<I6d")
+                path.symbol = (symbol - 1, n, tuple(m))
+            path.ops = bytearray(data[pos:pos+n_ops])
+            pos += n_ops
+            path.coords.frombytes(data[pos:pos+8*n_coords])
+            if sys.byteorder == "big":
+                path.coords.byteswap()
+            pos += 8 * n_coords
+            for _ in range(n_texts):
+                *m, p, l = read("<6d2I")
+                path.texts.append((Affine(*m), data[pos:pos+l].decode("utf-8"), params[p]))
+                pos += l
+            return path
+
+        parts = []
+        for _ in range(read("<I")[0]):
+            part = Part("part")
+            part.pathes = [read_path() for _ in range(read("<I")[0])]
+            parts.append(part)
+        surface.parts = parts
+        if parts:
+            surface._p = parts[-1]
+        surface.symbols = {}
+        for symbol in range(read("<I")[0]):
+            surface.symbols[symbol] = [read_path() if read("<B")[0] else None
+                                       for _ in range(read("<I")[0])]
+        surface.instances = header["instances"]
+        surface.precision = header["precision"]
+
+        metadata = header["metadata"]
+        if isinstance(metadata.get("creation_date"), str):
+            metadata["creation_date"] = datetime.datetime.fromisoformat(metadata["creation_date"])
+        surface.set_metadata(metadata)
+        return header["inner_corners"]
+
+
 from random import random
 
 
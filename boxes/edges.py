@@ -168,21 +168,26 @@ class Settings:
     absolute_params: dict[str, Any] = {}  # TODO find better typing.
     relative_params: dict[str, Any] = {}  # TODO find better typing.
 
+    @classmethod
+    def _parseDoc(cls) -> tuple[str, dict[str, str]]:
+        """Title and parameter descriptions from the doc string, cached per class"""
+        if "_doc" not in cls.__dict__:
+            lines = cls.__doc__.split("\n")
+            descriptions = {}
+            r = re.compile(r"^ +\* +(\S+) +: .* : +(.*)")
+            for l in lines:
+                m = r.search(l)
+                if m:
+                    descriptions[m.group(1)] = m.group(2)
+            cls._doc = (lines[0] or lines[1], descriptions)
+        return cls._doc
+
     @classmethod
     def parserArguments(cls, parser, prefix=None, **defaults):
         prefix = prefix or cls.__name__[:-len("Settings")]
 
-        lines = cls.__doc__.split("\n")
-
-        # Parse doc string
-        descriptions = {}
-        r = re.compile(r"^ +\* +(\S+) +: .* : +(.*)")
-        for l in lines:
-            m = r.search(l)
-            if m:
-                descriptions[m.group(1)] = m.group(2)
-
-        group = parser.add_argument_group(lines[0] or lines[1])
+        title, descriptions = cls._parseDoc()
+        group = parser.add_argument_group(title)
         group.prefix = prefix
         for name, default in (sorted(cls.absolute_params.items()) +
                               sorted(cls.relative_params.items())):
@@ -295,6 +300,97 @@ class Settings:
 #############################################################################
 
 
+class LazyEdges(dict):
+    """Edges by char, creating groups of edges on first lookup
+
+    Edges sharing a Settings object are registered with lazy() and
+    created together when one of their chars is looked up. Edges set
+    explicitly are not replaced by a later build. Iterating builds all
+    edges in the order they were registered.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._builders: dict[str, Any] = {}
+        self._order: dict[str, None] = {}
+        self._building = None
+
+    def lazy(self, chars: str, builder) -> None:
+        """Call builder() on first lookup of one of the chars"""
+        for c in chars:
+            self._builders[c] = builder
+            self._order.setdefault(c)
+
+    def _build(self, char) -> bool:
+        builder = self._builders.get(char)
+        if builder is None:
+            return False
+        for c in [c for c, b in self._builders.items() if b is builder]:
+            del self._builders[c]
+        building, self._building = self._building, builder
+        try:
+            builder()
+        finally:
+            self._building = building
+        return True
+
+    def _buildAll(self) -> None:
+        if not self._builders:
+            return
+        while self._builders:
+            self._build(next(iter(self._builders)))
+        items = [(c, dict.__getitem__(self, c)) for c in self._order
+                 if dict.__contains__(self, c)]
+        dict.clear(self)
+        dict.update(self, items)
+
+    def __setitem__(self, char, edge) -> None:
+        if self._building is not None and (
+                dict.__contains__(self, char) or char in self._builders):
+            return  # set explicitly or belongs to another group
+        self._builders.pop(char, None)
+        self._order.setdefault(char)
+        dict.__setitem__(self, char, edge)
+
+    def __missing__(self, char):
+        if self._build(char) and dict.__contains__(self, char):
+            return dict.__getitem__(self, char)
+        raise KeyError(char)
+
+    def __contains__(self, char) -> bool:
+        return dict.__contains__(self, char) or (
+            self._build(char) and dict.__contains__(self, char))
+
+    def get(self, char, default=None):
+        if char in self:
+            return dict.__getitem__(self, char)
+        return default
+
+    def __iter__(self):
+        self._buildAll()
+        return dict.__iter__(self)
+
+    def __len__(self) -> int:
+        self._buildAll()
+        return dict.__len__(self)
+
+    def keys(self):
+        self._buildAll()
+        return dict.keys(self)
+
+    def values(self):
+        self._buildAll()
+        return dict.values(self)
+
+    def items(self):
+        self._buildAll()
+        return dict.items(self)
+
+    def copy(self) -> dict:
+        self._buildAll()
+        return dict(dict.items(self))
+
+
 class BaseEdge(ABC):
     """Abstract base class for all Edges"""
     char: str | None = None
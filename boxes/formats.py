@@ -13,13 +13,14 @@
 #   You should have received a copy of the GNU General Public License
 #   along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from __future__ import annotations
 
 import os
 import shutil
 import subprocess
 import tempfile
 import io
-from boxes.drawing import Context, LBRN2Surface, PSSurface, SVGSurface
+from boxes.drawing import BXGSurface, Context, DXFSurface, GCodeSurface, HPGLSurface, LBRN2Surface, PSSurface, SVGSurface
 
 
 class Formats:
@@ -27,16 +28,17 @@ class Formats:
     pstoedit_candidates = ["/usr/bin/pstoedit", "pstoedit", r"C:\Program Files\pstoedit\pstoedit.exe", "pstoedit.exe"]
     ps2pdf_candidates = ["/usr/bin/ps2pdf", "ps2pdf", "ps2pdf.exe"]
 
-    _BASE_FORMATS = ['svg', 'svg_Ponoko', 'ps', 'lbrn2']
+    _BASE_FORMATS = ['svg', 'svg_Ponoko', 'ps', 'lbrn2', 'dxf', 'gcode', 'plt', 'bxg']
 
     formats = {
         "svg": None,
         "svg_Ponoko": None,
         "ps": None,
         "lbrn2": None,
-        "dxf": "{pstoedit} -flat 0.1 -f dxf:-mm {input} {output}",
-        "gcode": "{pstoedit} -f gcode {input} {output}",
-        "plt": "{pstoedit} -f hpgl {input} {output}",
+        "dxf": None,
+        "gcode": None,
+        "plt": None,
+        "bxg": None,
         # "ai": "{pstoedit} -f ps2ai",
         "pdf": "{ps2pdf} -dEPSCrop {input} {output}",
     }
@@ -49,30 +51,49 @@ class Formats:
         "dxf": [('Content-type', 'image/vnd.dxf')],
         "plt": [('Content-type', ' application/vnd.hp-hpgl')],
         "gcode": [('Content-type', 'text/plain; charset=utf-8')],
+        "bxg": [('Content-type', 'application/octet-stream')],
 
         # "" : [('Content-type', '')],
     }
 
+    # (pstoedit, ps2pdf) found on the first call of __init__
+    _tools: tuple[str | None, str | None] | None = None
+
     def __init__(self) -> None:
-        for cmd in self.pstoedit_candidates:
-            self.pstoedit = shutil.which(cmd)
-            if self.pstoedit:
-                break
-        for cmd in self.ps2pdf_candidates:
-            self.ps2pdf = shutil.which(cmd)
-            if self.ps2pdf:
-                break
+        if Formats._tools is None:
+            Formats._tools = (self._which(self.pstoedit_candidates),
+                              self._which(self.ps2pdf_candidates))
+        self.pstoedit, self.ps2pdf = Formats._tools
+
+    @staticmethod
+    def _which(candidates) -> str | None:
+        for cmd in candidates:
+            path = shutil.which(cmd)
+            if path:
+                return path
+        return None
 
     def getFormats(self):
         if self.pstoedit:
             return sorted(self.formats.keys())
         return self._BASE_FORMATS
 
+    def needsConversion(self, fmt) -> bool:
+        return fmt not in self._BASE_FORMATS
+
     def getSurface(self, fmt):
         if fmt in ("svg", "svg_Ponoko"):
             surface = SVGSurface()
         elif fmt == "lbrn2":
             surface = LBRN2Surface()
+        elif fmt == "dxf":
+            surface = DXFSurface()
+        elif fmt == "gcode":
+            surface = GCodeSurface()
+        elif fmt == "plt":
+            surface = HPGLSurface()
+        elif fmt == "bxg":
+            surface = BXGSurface()
         else:
             surface = PSSurface()
 
@@ -81,7 +102,7 @@ class Formats:
 
     def convert(self, data, fmt):
 
-        if fmt not in self._BASE_FORMATS:
+        if self.needsConversion(fmt):
             fd, tmpfile = tempfile.mkstemp()
             try:
                 os.write(fd, data.getvalue())
@@ -107,3 +128,9 @@ class Formats:
                 os.unlink(tmpfile)
 
         return data
+
+    def convertGeometry(self, data, fmt):
+        """Write a drawing saved in bxg format as fmt"""
+        surface = self.getSurface(fmt)[0]
+        inner_corners = BXGSurface.load(data, surface)
+        return self.convert(surface.finish(inner_corners), fmt)
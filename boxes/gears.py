@@ -268,122 +268,130 @@ class Gears():
         #    # print >>self.tty, "gears-dev " + __version__
 
         self.boxes = boxes
-        self.OptionParser = OptionParser()
-        self.OptionParser.add_option("-t", "--teeth",
-                                     action="store", type="int",
-                                     dest="teeth", default=24,
-                                     help="Number of teeth")
-
-        self.OptionParser.add_option("-s", "--system",
-                                     action="store", type="string",
-                                     dest="system", default='MM',
-                                     help="Select system: 'CP' (Cyclic Pitch (default)), 'DP' (Diametral Pitch), 'MM' (Metric Module)")
-
-        self.OptionParser.add_option("-d", "--dimension",
-                                     action="store", type="float",
-                                     dest="dimension", default=1.0,
-                                     help="Tooth size, depending on system (which defaults to CP)")
-
-
-        self.OptionParser.add_option("-a", "--angle",
-                                     action="store", type="float",
-                                     dest="angle", default=20.0,
-                                     help="Pressure Angle (common values: 14.5, 20, 25 degrees)")
-
-        self.OptionParser.add_option("-p", "--profile-shift",
-                                     action="store", type="float",
-                                     dest="profile_shift", default=20.0,
-                                     help="Profile shift [in percent of the module]. Negative values help against undercut")
-
-        self.OptionParser.add_option("-u", "--units",
-                                     action="store", type="string",
-                                     dest="units", default='mm',
-                                     help="Units this dialog is using")
-
-        self.OptionParser.add_option("-A", "--accuracy",
-                                     action="store", type="int",
-                                     dest="accuracy", default=0,
-                                     help="Accuracy of involute: automatic: 5..20 (default), best: 20(default), medium 10, low: 5; good accuracy is important with a low tooth count")
-        # Clearance: Radial distance between top of tooth on one gear to bottom of gap on another.
-        self.OptionParser.add_option("", "--clearance",
-                                     action="store", type="float",
-                                     dest="clearance", default=0.0,
-                                     help="Clearance between bottom of gap of this gear and top of tooth of another")
-
-        self.OptionParser.add_option("", "--annotation",
-                                     action="store", type="inkbool",
-                                     dest="annotation", default=False,
-                                     help="Draw annotation text")
-
-        self.OptionParser.add_option("-i", "--internal-ring",
-                                     action="store", type="inkbool",
-                                     dest="internal_ring", default=False,
-                                     help="Ring (or Internal) gear style (default: normal spur gear)")
-
-        self.OptionParser.add_option("", "--mount-hole",
-                                     action="store", type="float",
-                                     dest="mount_hole", default=0.,
-                                     help="Mount hole diameter")
-
-        self.OptionParser.add_option("", "--mount-diameter",
-                                     action="store", type="float",
-                                     dest="mount_diameter", default=15,
-                                     help="Mount support diameter")
-
-        self.OptionParser.add_option("", "--spoke-count",
-                                     action="store", type="int",
-                                     dest="spoke_count", default=3,
-                                     help="Spokes count")
-
-        self.OptionParser.add_option("", "--spoke-width",
-                                     action="store", type="float",
-                                     dest="spoke_width", default=5,
-                                     help="Spoke width")
-
-        self.OptionParser.add_option("", "--holes-rounding",
-                                     action="store", type="float",
-                                     dest="holes_rounding", default=5,
-                                     help="Holes rounding")
-
-        self.OptionParser.add_option("", "--active-tab",
-                                     action="store", type="string",
-                                     dest="active_tab", default='',
-                                     help="Active tab. Not used now.")
-
-        self.OptionParser.add_option("-x", "--centercross",
-                                     action="store", type="inkbool",
-                                     dest="centercross", default=False,
-                                     help="Draw cross in center")
-
-        self.OptionParser.add_option("-c", "--pitchcircle",
-                                     action="store", type="inkbool",
-                                     dest="pitchcircle", default=False,
-                                     help="Draw pitch circle (for mating)")
-
-        self.OptionParser.add_option("-r", "--draw-rack",
-                                     action="store", type="inkbool",
-                                     dest="drawrack", default=False,
-                                     help="Draw rack gear instead of spur gear")
-
-        self.OptionParser.add_option("", "--rack-teeth-length",
-                                     action="store", type="int",
-                                     dest="teeth_length", default=12,
-                                     help="Length (in teeth) of rack")
-
-        self.OptionParser.add_option("", "--rack-base-height",
-                                     action="store", type="float",
-                                     dest="base_height", default=8,
-                                     help="Height of base of rack")
-
-        self.OptionParser.add_option("", "--rack-base-tab",
-                                     action="store", type="float",
-                                     dest="base_tab", default=14,
-                                     help="Length of tabs on ends of rack")
-
-        self.OptionParser.add_option("", "--undercut-alert",
-                                     action="store", type="inkbool",
-                                     dest="undercut_alert", default=False,
-                                     help="Let the user confirm a warning dialog if undercut occurs. This dialog also shows helpful hints against undercut")
+        self.OptionParser = self.optionParser()
+
+    @classmethod
+    def optionParser(cls) -> OptionParser:
+        """Parser for the gear options, built once and shared by all instances"""
+        if "_optionParser" not in cls.__dict__:
+            parser = OptionParser()
+            parser.add_option("-t", "--teeth",
+                              action="store", type="int",
+                              dest="teeth", default=24,
+                              help="Number of teeth")
+
+            parser.add_option("-s", "--system",
+                              action="store", type="string",
+                              dest="system", default='MM',
+                              help="Select system: 'CP' (Cyclic Pitch (default)), 'DP' (Diametral Pitch), 'MM' (Metric Module)")
+
+            parser.add_option("-d", "--dimension",
+                              action="store", type="float",
+                              dest="dimension", default=1.0,
+                              help="Tooth size, depending on system (which defaults to CP)")
+
+
+            parser.add_option("-a", "--angle",
+                              action="store", type="float",
+                              dest="angle", default=20.0,
+                              help="Pressure Angle (common values: 14.5, 20, 25 degrees)")
+
+            parser.add_option("-p", "--profile-shift",
+                              action="store", type="float",
+                              dest="profile_shift", default=20.0,
+                              help="Profile shift [in percent of the module]. Negative values help against undercut")
+
+            parser.add_option("-u", "--units",
+                              action="store", type="string",
+                              dest="units", default='mm',
+                              help="Units this dialog is using")
+
+            parser.add_option("-A", "--accuracy",
+                              action="store", type="int",
+                              dest="accuracy", default=0,
+                              help="Accuracy of involute: automatic: 5..20 (default), best: 20(default), medium 10, low: 5; good accuracy is important with a low tooth count")
+            # Clearance: Radial distance between top of tooth on one gear to bottom of gap on another.
+            parser.add_option("", "--clearance",
+                              action="store", type="float",
+                              dest="clearance", default=0.0,
+                              help="Clearance between bottom of gap of this gear and top of tooth of another")
+
+            parser.add_option("", "--annotation",
+                              action="store", type="inkbool",
+                              dest="annotation", default=False,
+                              help="Draw annotation text")
+
+            parser.add_option("-i", "--internal-ring",
+                              action="store", type="inkbool",
+                              dest="internal_ring", default=False,
+                              help="Ring (or Internal) gear style (default: normal spur gear)")
+
+            parser.add_option("", "--mount-hole",
+                              action="store", type="float",
+                              dest="mount_hole", default=0.,
+                              help="Mount hole diameter")
+
+            parser.add_option("", "--mount-diameter",
+                              action="store", type="float",
+                              dest="mount_diameter", default=15,
+                              help="Mount support diameter")
+
+            parser.add_option("", "--spoke-count",
+                              action="store", type="int",
+                              dest="spoke_count", default=3,
+                              help="Spokes count")
+
+            parser.add_option("", "--spoke-width",
+                              action="store", type="float",
+                              dest="spoke_width", default=5,
+                              help="Spoke width")
+
+            parser.add_option("", "--holes-rounding",
+                              action="store", type="float",
+                              dest="holes_rounding", default=5,
+                              help="Holes rounding")
+
+            parser.add_option("", "--active-tab",
+                              action="store", type="string",
+                              dest="active_tab", default='',
+                              help="Active tab. Not used now.")
+
+            parser.add_option("-x", "--centercross",
+                              action="store", type="inkbool",
+                              dest="centercross", default=False,
+                              help="Draw cross in center")
+
+            parser.add_option("-c", "--pitchcircle",
+                              action="store", type="inkbool",
+                              dest="pitchcircle", default=False,
+                              help="Draw pitch circle (for mating)")
+
+            parser.add_option("-r", "--draw-rack",
+                              action="store", type="inkbool",
+                              dest="drawrack", default=False,
+                              help="Draw rack gear instead of spur gear")
+
+            parser.add_option("", "--rack-teeth-length",
+                              action="store", type="int",
+                              dest="teeth_length", default=12,
+                              help="Length (in teeth) of rack")
+
+            parser.add_option("", "--rack-base-height",
+                              action="store", type="float",
+                              dest="base_height", default=8,
+                              help="Height of base of rack")
+
+            parser.add_option("", "--rack-base-tab",
+                              action="store", type="float",
+                              dest="base_tab", default=14,
+                              help="Length of tabs on ends of rack")
+
+            parser.add_option("", "--undercut-alert",
+                              action="store", type="inkbool",
+                              dest="undercut_alert", default=False,
+                              help="Let the user confirm a warning dialog if undercut occurs. This dialog also shows helpful hints against undercut")
+            cls._optionParser = parser
+        return cls._optionParser
 
     def calc_circular_pitch(self):
         """We use math based on circular pitch."""
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+import hashlib
 import importlib
 import inspect
+import json
 import os
 import pkgutil
 from types import ModuleType
@@ -48,12 +50,23 @@ ui_groups: list[UIGroup] = [
     UIGroup("Unstable", description="Generators are still untested or need manual adjustment to be useful."),
 ]
 
+# Multistep generators and generators requiring input can't be rendered
+# with their default settings. Left out of examples and benchmarks.
+example_skip = ('GridfinityTrayLayout', 'TrayLayout', 'TrayLayoutFile', 'TypeTray', 'Edges',)
 
-def getAllBoxGenerators() -> dict[str, type[boxes.Boxes]]:
-    generators = {}
+
+def _generatorPath() -> list[str]:
     path = __path__
     if "BOXES_GENERATOR_PATH" in os.environ:
-        path.extend(os.environ.get("BOXES_GENERATOR_PATH", "").split(":"))
+        for p in os.environ.get("BOXES_GENERATOR_PATH", "").split(":"):
+            if p not in path:
+                path.append(p)
+    return list(path)
+
+
+def getAllBoxGenerators() -> dict[str, type[boxes.Boxes]]:
+    generators = {}
+    path = _generatorPath()
     for importer, modname, ispkg in pkgutil.walk_packages(path=path, prefix=__name__ + '.'):
         module = importlib.import_module(modname)
         if module.__name__.split('.')[-1].startswith("_"):
@@ -68,9 +81,7 @@ def getAllBoxGenerators() -> dict[str, type[boxes.Boxes]]:
 
 def getAllGeneratorModules() -> dict[str, ModuleType]:
     generators = {}
-    path = __path__
-    if "BOXES_GENERATOR_PATH" in os.environ:
-        path.extend(os.environ.get("BOXES_GENERATOR_PATH", "").split(":"))
+    path = _generatorPath()
     for importer, modname, ispkg in pkgutil.walk_packages(
             path=path,
             prefix=__name__ + '.',
@@ -78,3 +89,98 @@ def getAllGeneratorModules() -> dict[str, ModuleType]:
         module = importlib.import_module(modname)
         generators[modname.split('.')[-1]] = module
     return generators
+
+
+class GeneratorInfo:
+    """Registry entry describing a generator without importing it
+
+    Has __name__, __doc__, ui_group and webinterface like the generator
+    class itself so it can be used in UIGroup and listings.
+    """
+
+    def __init__(self, name: str, module: str, ui_group: str = "Misc", doc: str | None = None, webinterface: bool = True) -> None:
+        self.__name__ = name
+        self.__doc__ = doc
+        self.module = module
+        self.ui_group = ui_group
+        self.webinterface = webinterface
+
+    def load(self) -> type[boxes.Boxes]:
+        """Import the module and return the generator class"""
+        return getattr(importlib.import_module(self.module), self.__name__)
+
+    def asdict(self) -> dict[str, Any]:
+        return {"name": self.__name__, "module": self.module, "ui_group": self.ui_group,
+                "doc": self.__doc__, "webinterface": self.webinterface}
+
+
+_registry: dict[str, GeneratorInfo] | None = None
+_registry_stamp: list[Any] | None = None
+
+
+def _registryFile(path: list[str]) -> str:
+    cachedir = os.environ.get("BOXES_CACHE_DIR") or os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "boxes.py")
+    digest = hashlib.sha1(":".join(os.path.abspath(p) for p in path).encode("utf-8")).hexdigest()
+    return os.path.join(cachedir, f"generators-{digest[:12]}.json")
+
+
+def _sourceStamp(path: list[str]) -> list[Any]:
+    """Names, sizes and modification times of all generator sources"""
+    stamp = []
+    for directory in path:
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            for fn in sorted(files):
+                if fn.endswith(".py"):
+                    st = os.stat(os.path.join(root, fn))
+                    stamp.append([os.path.relpath(os.path.join(root, fn), directory), st.st_size, st.st_mtime_ns])
+    return stamp
+
+
+def getGeneratorRegistry(refresh: bool = False) -> dict[str, GeneratorInfo]:
+    """Generators by qualified name as in getAllBoxGenerators()
+
+    Read from a cache file that is regenerated by importing all
+    generators if any of their source files changed.
+    """
+    global _registry, _registry_stamp
+    path = _generatorPath()
+    stamp = _sourceStamp(path)
+    if not refresh and _registry is not None and stamp == _registry_stamp:
+        return _registry
+
+    fn = _registryFile(path)
+    if not refresh:
+        try:
+            with open(fn) as f:
+                data = json.load(f)
+            if data["stamp"] == stamp:
+                _registry = {k: GeneratorInfo(**v) for k, v in data["generators"].items()}
+                _registry_stamp = stamp
+                return _registry
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    _registry = {
+        name: GeneratorInfo(cls.__name__, cls.__module__, cls.ui_group, cls.__doc__, cls.webinterface)
+        for name, cls in getAllBoxGenerators().items()}
+    _registry_stamp = stamp
+    try:
+        os.makedirs(os.path.dirname(fn), exist_ok=True)
+        tmp = f"{fn}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"stamp": stamp, "generators": {k: v.asdict() for k, v in _registry.items()}}, f)
+        os.replace(tmp, fn)
+    except OSError:
+        pass
+    return _registry
+
+
+def getBoxGenerator(name: str) -> type[boxes.Boxes] | None:
+    """Import and return a single generator by (case insensitive) class name"""
+    lower_name = name.lower()
+    for info in getGeneratorRegistry().values():
+        if info.__name__.lower() == lower_name:
+            return info.load()
+    return None
@@ -6,9 +6,15 @@ Generate stencils for wooden boxes.
 """
 from __future__ import annotations
 
+import concurrent.futures
 import gettext
+import hashlib
+import importlib
+import inspect
+import json
 import os
 import sys
+import time
 import argparse
 from pathlib import Path
 
@@ -18,6 +24,7 @@ except ImportError:
     sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '../..'))
     import boxes
 
+import boxes.formats
 import boxes.generators
 
 
@@ -40,29 +47,118 @@ def print_grouped_generators() -> None:
             print(f' *  {box.__name__:<15} - {ConsoleColors.ITALIC}{description}{ConsoleColors.CLEAR}')
 
 
-def create_example_every_generator() -> None:
-    print("Generating SVG examples for every possible generator.")
-    for group in generator_groups():
-        for boxExample in group.generators:
-            boxName = boxExample.__name__
-            notTestGenerator = ('GridfinityTrayLayout', 'TrayLayout', 'TrayLayoutFile', 'TypeTray', 'Edges',)
-            brokenGenerator = ()
-            avoidGenerator = notTestGenerator + brokenGenerator
-            if boxName in avoidGenerator:
-                print(f"SKIP: {boxName}")
-                continue
-            print(f"Generate example for: {boxName}")
-
-            box = boxExample()
-            box.translations = get_translation()
-            box.parseArgs("")
-            box.metadata["reproducible"] = True
-            box.open()
-            box.render()
-            boxData = box.close()
+def _module_files(module) -> set[str]:
+    """Source files of a generator module and the generator modules it uses"""
+    files: set[str] = set()
+    todo = [module]
+    while todo:
+        module = todo.pop()
+        if not getattr(module, "__file__", None) or module.__file__ in files:
+            continue
+        files.add(module.__file__)
+        for value in vars(module).values():
+            name = getattr(value, "__name__", "") if inspect.ismodule(value) else getattr(value, "__module__", None) or ""
+            if name.startswith("boxes.generators.") and name in sys.modules:
+                todo.append(sys.modules[name])
+    return files
+
+
+def _digest(files, *extra) -> str:
+    h = hashlib.sha256()
+    for fn in sorted(files):
+        h.update(Path(fn).read_bytes())
+    for e in extra:
+        h.update(repr(e).encode("utf-8"))
+    return h.hexdigest()
+
+
+def example_hash(box_cls, core: str) -> str:
+    """Hash of the generator sources, the core library hash and the defaults"""
+    defaults = [(a.dest, a.default) for a in box_cls().argparser._actions]
+    return _digest(_module_files(sys.modules[box_cls.__module__]), core, defaults)
+
+
+def _render_example(module: str, name: str, directory: str) -> tuple[str, float, str | None]:
+    start = time.perf_counter()
+    try:
+        box = getattr(importlib.import_module(module), name)()
+        box.translations = get_translation()
+        box.parseArgs("")
+        box.metadata["reproducible"] = True
+        box.open()
+        box.render()
+        boxData = box.close()
+        (Path(directory) / (name + '.svg')).write_bytes(boxData.getvalue())
+    except Exception as e:
+        return name, time.perf_counter() - start, f"{e.__class__.__name__}: {e}"
+    return name, time.perf_counter() - start, None
+
 
-            file = Path('examples') / (boxName + '.svg')
-            file.write_bytes(boxData.getvalue())
+def create_example_every_generator(args=()) -> int:
+    """Render the SVG examples of all changed generators in parallel
+
+    Returns the number of generators that failed.
+    """
+    parser = argparse.ArgumentParser(prog="boxes --examples")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="number of processes rendering")
+    parser.add_argument("--force", action="store_true", default=False, help="render even if nothing changed")
+    parser.add_argument("--directory", type=str, default="examples")
+    parser.add_argument("generators", nargs="*", help="generators to render (default: all)")
+    args = parser.parse_args(args)
+
+    print("Generating SVG examples for every possible generator.")
+    directory = Path(args.directory)
+    directory.mkdir(exist_ok=True)
+    manifest_file = directory / ".manifest.json"
+    try:
+        manifest = json.loads(manifest_file.read_text())
+    except (OSError, ValueError):
+        manifest = {}
+
+    core_dir = Path(boxes.__file__).parent
+    core = _digest(list(core_dir.glob("*.py")) + [core_dir / "generators" / "__init__.py"])
+    names = {n.lower() for n in args.generators}
+    todo = {}
+    unchanged = 0
+    for info in sorted(generators_by_name().values(), key=lambda i: i.__name__):
+        boxName = info.__name__
+        if names and boxName.lower() not in names:
+            continue
+        if boxName in boxes.generators.example_skip:
+            print(f"SKIP: {boxName}")
+            continue
+        h = example_hash(info.load(), core)
+        if not args.force and manifest.get(boxName) == h and (directory / (boxName + '.svg')).exists():
+            unchanged += 1
+            continue
+        todo[boxName] = (info, h)
+
+    print(f"Generate {len(todo)} examples, {unchanged} unchanged.")
+    failed = 0
+    start = time.perf_counter()
+    jobs = [(info.module, name, str(directory)) for name, (info, h) in todo.items()]
+    if args.jobs > 1 and len(jobs) > 1:
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs)
+        results = concurrent.futures.as_completed([pool.submit(_render_example, *job) for job in jobs])
+        results = (future.result() for future in results)
+    else:
+        pool = None
+        results = (_render_example(*job) for job in jobs)
+    try:
+        for boxName, duration, error in results:
+            if error:
+                failed += 1
+                manifest.pop(boxName, None)
+                print(f"FAILED: {boxName} after {duration:.2f}s: {error}")
+            else:
+                manifest[boxName] = todo[boxName][1]
+                print(f"Generated {boxName} in {duration:.2f}s")
+    finally:
+        if pool:
+            pool.shutdown()
+        manifest_file.write_text(json.dumps(dict(sorted(manifest.items())), indent=1) + "\n")
+    print(f"Done in {time.perf_counter() - start:.2f}s, {failed} failed.")
+    return failed
 
 
 def get_translation():
@@ -72,17 +168,20 @@ def get_translation():
         return gettext.translation('boxes.py', fallback=True)
 
 
-def run_generator(name: str, args) -> None:
-    generators = generators_by_name()
-    lower_name = name.lower()
+def run_generator(name: str, args, profile: bool = False, profile_output: str | None = None) -> None:
+    box_cls = boxes.generators.getBoxGenerator(name)
 
-    if lower_name in generators.keys():
-        box = generators[lower_name]()
+    if box_cls is not None:
+        box = box_cls()
         box.translations = get_translation()
-        box.parseArgs(args)
-        box.open()
-        box.render()
-        data = box.close()
+        if profile or profile_output:
+            from boxes.benchmark import profileGenerator
+            data = profileGenerator(box, args, profile_output)
+        else:
+            box.parseArgs(args)
+            box.open()
+            box.render()
+            data = box.close()
         with os.fdopen(sys.stdout.fileno(), "wb", closefd=False) if box.output == "-" else open(box.output, 'wb') as f:
             f.write(data.getvalue())
     else:
@@ -90,6 +189,77 @@ def run_generator(name: str, args) -> None:
         sys.stderr.write(msg)
 
 
+def convert_geometry(filename: str, args) -> None:
+    formats = boxes.formats.Formats()
+    parser = argparse.ArgumentParser(prog="boxes --convert")
+    parser.add_argument("--format", type=str, default="svg", choices=formats.getFormats())
+    parser.add_argument("--output", type=str, default=None)
+    args = parser.parse_args(args)
+    output = args.output or Path(filename).stem + "." + args.format.split("_")[0]
+
+    data = formats.convertGeometry(Path(filename).read_bytes(), args.format)
+    with os.fdopen(sys.stdout.fileno(), "wb", closefd=False) if output == "-" else open(output, 'wb') as f:
+        f.write(data.getvalue())
+
+
+def run_benchmark(args) -> int:
+    import boxes.benchmark
+
+    parser = argparse.ArgumentParser(prog="boxes --benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="renders per generator, the best time is used")
+    parser.add_argument("--format", type=str, default="svg")
+    parser.add_argument("--output", type=str, default=None, help="write results as JSON")
+    parser.add_argument("--baseline", type=str, default=None, help="JSON results to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative slow down or memory increase counted as regression")
+    parser.add_argument("--output-size", action="store_true", default=False, help="compare bytes and write time of the plain and the compact output")
+    parser.add_argument("--precision", type=int, default=3, help="decimals of the compact output")
+    parser.add_argument("--pytest", action="store_true", default=False, help="run tests/test_benchmark.py with pytest-benchmark instead, unknown arguments are passed to pytest")
+    parser.add_argument("generators", nargs="*", help="generators to run (default: all)")
+    args, extra = parser.parse_known_args(args)
+
+    if args.pytest:
+        return run_benchmark_tests(args.generators, extra)
+    if extra:
+        parser.error("unrecognized arguments: " + " ".join(extra))
+
+    if args.output_size:
+        results = boxes.benchmark.runOutputSizes(args.generators, args.format, args.precision, args.repeat,
+                                                 progress=lambda name: print(f"Benchmark: {name}", file=sys.stderr))
+        print(boxes.benchmark.formatOutputTable(results))
+        if args.output:
+            Path(args.output).write_text(json.dumps(results, indent=1))
+        return 0
+
+    results = boxes.benchmark.runBenchmark(args.generators, args.repeat, args.format,
+                                           progress=lambda name: print(f"Benchmark: {name}", file=sys.stderr))
+    baseline = None
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+    print(boxes.benchmark.formatTable(results, baseline))
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=1))
+
+    if baseline is None:
+        return 0
+    regressions = boxes.benchmark.compare(results, baseline, args.threshold)
+    for name, measure, old, new in regressions:
+        print(f"REGRESSION: {name} {measure} {old:.4g} -> {new:.4g}")
+    return 1 if regressions else 0
+
+
+def run_benchmark_tests(generators, pytest_args) -> int:
+    import pytest
+
+    tests = Path(__file__).resolve().parent.parent.parent / "tests" / "test_benchmark.py"
+    if not tests.exists():
+        print(f"{tests} not found. Run from a source checkout.", file=sys.stderr)
+        return 1
+    if generators:
+        pytest_args = ["-k", " or ".join(generators)] + pytest_args
+    os.environ["BOXES_BENCHMARK"] = "1"
+    return int(pytest.main([str(tests)] + pytest_args))
+
+
 def generator_groups():
     generators = generators_by_name()
     return group_generators(generators)
@@ -106,8 +276,8 @@ def group_generators(generators):
     return groups
 
 
-def generators_by_name() -> dict[str, type[boxes.Boxes]]:
-    all_generators = boxes.generators.getAllBoxGenerators()
+def generators_by_name() -> dict[str, boxes.generators.GeneratorInfo]:
+    all_generators = boxes.generators.getGeneratorRegistry()
 
     return {
         name.split('.')[-1].lower(): generator
@@ -135,9 +305,13 @@ def main() -> None:
     parser.add_argument("--debug", action="store_true", default=False)
     parser.add_argument("--version", action="store_true", default=False)
     parser.add_argument("--list", action="store_true", default=False, help="List available generators.")
-    parser.add_argument("--examples", action="store_true", default=False, help='Generates an SVG for every generator into the "examples" folder.')
+    parser.add_argument("--examples", action="store_true", default=False, help='Generates an SVG for every changed generator into the "examples" folder. See boxes --examples --help.')
+    parser.add_argument("--benchmark", action="store_true", default=False, help="Measure rendering all generators. See boxes --benchmark --help.")
+    parser.add_argument("--convert", type=str, default=None, metavar="FILE", help="Convert a drawing saved with --format=bxg. Use --format and --output to select the result.")
+    parser.add_argument("--profile-render", action="store_true", default=False, help="Profile the generator and print times, drawing counters and the slowest functions to stderr.")
+    parser.add_argument("--profile-output", type=str, default=None, metavar="FILE", help="Save the profile as FILE. Speedscope format for .json, pstats otherwise. Implies --profile-render. For .json the stacks are sampled instead of running cProfile, so no function list is printed. Times include the overhead of the profiler.")
     args, extra = parser.parse_known_args()
-    if args.generator and (args.examples or args.list):
+    if args.generator and (args.examples or args.list or args.convert or args.benchmark):
         parser.error("cannot combine --generator with other commands")
 
     # if debug is True set logging level
@@ -150,13 +324,17 @@ def main() -> None:
     elif args.list:
         print_grouped_generators()
     elif args.examples:
-        create_example_every_generator()
+        sys.exit(1 if create_example_every_generator(extra) else 0)
+    elif args.convert:
+        convert_geometry(args.convert, extra)
+    elif args.benchmark:
+        sys.exit(run_benchmark(extra))
     else:
         if args.generator:
             name = args.generator
         else:
             name = extra.pop(0).lower()
-        run_generator(name, extra)
+        run_generator(name, extra, args.profile_render, args.profile_output)
 
 if __name__ == '__main__':
     # Setup basic logging
@@ -16,23 +16,29 @@
 from __future__ import annotations
 
 import argparse
+import concurrent.futures
 import gettext
 import glob
+import gzip
+import hashlib
 import html
 import io
+import itertools
+import json
 import mimetypes
 import os.path
 import re
+import signal
+import socketserver
 import sys
 import threading
 import time
 import traceback
+import zlib
+from collections import OrderedDict
 from typing import Any, NoReturn
 from urllib.parse import quote, unquote_plus
-from wsgiref.simple_server import make_server
-
-import markdown  # type: ignore
-import qrcode
+from wsgiref.simple_server import WSGIServer, make_server
 
 try:
     import boxes.generators
@@ -104,9 +110,195 @@ def filter_url(url, non_default_args):
         return f"{base}"
 
 
+# content types worth compressing
+COMPRESSIBLE = ("text/", "image/svg+xml", "application/postscript", "application/lbrn2",
+                "image/vnd.dxf", "application/vnd.hp-hpgl", "application/javascript",
+                "application/json")
+
+
+def accepts_gzip(environ) -> bool:
+    """The client accepts gzip content coding"""
+    for coding in environ.get("HTTP_ACCEPT_ENCODING", "").split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            q = re.search(r"q\s*=\s*([0-9.]+)", params)
+            try:
+                return not q or float(q.group(1)) > 0
+            except ValueError:
+                return False
+    return False
+
+
+def is_compressible(headers) -> bool:
+    for name, value in headers:
+        if name.lower() == "content-type":
+            return value.strip().startswith(COMPRESSIBLE)
+    return False
+
+
+def etag_matches(environ, etag: str) -> bool:
+    """etag is in the If-None-Match header (weak comparison)"""
+    header = environ.get("HTTP_IF_NONE_MATCH")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tags = [t.strip() for t in header.split(",")]
+    return etag.removeprefix("W/") in [t.removeprefix("W/") for t in tags]
+
+
+def gzip_etag(etag: str) -> str:
+    """Entity tag of the gzip compressed variant"""
+    return etag[:-1] + '-gz"'
+
+
+def gzip_chunks(data, level: int = 6):
+    """Compress an iterable of bytes, yielding the output as it comes"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip header
+    for chunk in data:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def not_modified(start_response, headers) -> list[bytes]:
+    start_response("304 Not Modified",
+                   [h for h in headers if h[0].lower() in ("etag", "cache-control", "vary")])
+    return []
+
+
+def render_key(stamp, name, non_default_args, fmt, lang_name, *extra) -> str:
+    args = sorted((k, repr(v)) for k, v in non_default_args.items())
+    return hashlib.sha256(repr((stamp, name, args, fmt, lang_name) + extra).encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    """Bounded LRU cache of rendered results
+
+    Entries are (headers, data) tuples. The memory tier is limited by
+    total size. If cache_dir is given entries are also written there and
+    survive eviction from memory and server restarts.
+    """
+
+    def __init__(self, max_size: int = 64 * 1024 * 1024, max_entry: int = 8 * 1024 * 1024, cache_dir: str | None = None, max_files: int = 1000) -> None:
+        self.max_size = max_size
+        self.max_entry = max_entry
+        self.cache_dir = cache_dir
+        self.max_files = max_files
+        self.size = 0
+        self.entries: OrderedDict[str, tuple[list[tuple[str, str]], bytes]] = OrderedDict()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "disk_evictions": 0}
+        self.lock = threading.Lock()
+        self.stamp = self._codeStamp()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def _codeStamp() -> str:
+        """Modification times of the loaded boxes modules
+
+        Invalidates disk entries written by a different version of the code.
+        """
+        base = os.path.dirname(os.path.abspath(boxes.__file__))
+        mtimes = []
+        for module in list(sys.modules.values()):
+            path = getattr(module, "__file__", None)
+            if path and os.path.abspath(path).startswith(base):
+                try:
+                    mtimes.append(os.stat(path).st_mtime)
+                except OSError:
+                    pass
+        return str(max(mtimes, default=0))
+
+    def key(self, name, non_default_args, fmt, lang_name, *extra) -> str:
+        return render_key(self.stamp, name, non_default_args, fmt, lang_name, *extra)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir or "", key + ".cache")
+
+    def get(self, key: str):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return self.entries[key]
+        entry = self._readFile(key)
+        with self.lock:
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["disk_hits"] += 1
+        self.put(key, *entry, write=False)
+        return entry
+
+    def put(self, key: str, headers, data: bytes, write: bool = True) -> None:
+        if len(data) > self.max_entry:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key)[1])
+            self.entries[key] = (headers, data)
+            self.size += len(data)
+            while self.size > self.max_size:
+                _, (_, old) = self.entries.popitem(last=False)
+                self.size -= len(old)
+                self.stats["evictions"] += 1
+        if write:
+            self._writeFile(key, headers, data)
+
+    def _readFile(self, key: str):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                headers = [tuple(h) for h in json.loads(f.readline())]
+                data = f.read()
+            os.utime(self._path(key))
+        except (OSError, ValueError):
+            return None
+        return headers, data
+
+    def _writeFile(self, key: str, headers, data: bytes) -> None:
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        try:
+            with open(path + ".tmp", "wb") as f:
+                f.write(json.dumps(headers).encode("utf-8") + b"\n")
+                f.write(data)
+            os.replace(path + ".tmp", path)
+            files = glob.glob(os.path.join(self.cache_dir, "*.cache"))
+            if len(files) > self.max_files:
+                files.sort(key=lambda fn: os.stat(fn).st_mtime)
+                for fn in files[:len(files) - self.max_files]:
+                    os.remove(fn)
+                    with self.lock:
+                        self.stats["disk_evictions"] += 1
+        except OSError:
+            pass
+
+    def wrap(self, key: str, headers, data):
+        """Pass through the chunks of data and store the result once complete"""
+        chunks = []
+        for chunk in data:
+            chunks.append(chunk)
+            yield chunk
+        self.put(key, headers, b"".join(chunks))
+
+    def info(self) -> dict[str, Any]:
+        with self.lock:
+            return dict(self.stats, entries=len(self.entries), size=self.size,
+                        max_size=self.max_size)
+
+
 class ArgumentParserError(Exception): pass
 
 
+class ThreadingWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
 class ThrowingArgumentParser(argparse.ArgumentParser):
     def error(self, message) -> NoReturn:
         raise ArgumentParserError(message)
@@ -119,13 +311,16 @@ boxes.ArgumentParser = ThrowingArgumentParser  # type: ignore
 class BServer:
     lang_re = re.compile(r"([a-z]{2,3}(-[-a-zA-Z0-9]*)?)\s*(;\s*q=(\d\.?\d*))?")
 
-    def __init__(self, url_prefix="", static_url="static", static_path="../static/", legal_url="") -> None:
-        self.boxes = {b.__name__: b for b in boxes.generators.getAllBoxGenerators().values() if b.webinterface}
+    # kept in memory with their compressed version if smaller
+    static_memory_limit = 1024 * 1024
+    render_cache_control = "public, no-cache"
+
+    def __init__(self, url_prefix="", static_url="static", static_path="../static/", legal_url="", cache_size=64, cache_dir=None, static_max_age=7 * 24 * 3600) -> None:
+        self.boxes = {b.__name__: b for b in boxes.generators.getGeneratorRegistry().values() if b.webinterface}
         self.groups = boxes.generators.ui_groups
         self.groups_by_name = boxes.generators.ui_groups_by_name
 
         for name, box in self.boxes.items():
-            box.UI = "web"
             self.groups_by_name.get(box.ui_group,
                                     self.groups_by_name["Misc"]).add(box)
 
@@ -140,6 +335,20 @@ class BServer:
         self.url_prefix = url_prefix
         self.static_url = static_url
         self.legal_url = legal_url
+        self.render_cache = RenderCache(cache_size * 1024 * 1024, cache_dir=cache_dir) if cache_size else None
+        self.stamp = self.render_cache.stamp if self.render_cache else RenderCache._codeStamp()
+        self.static_max_age = static_max_age
+        # key in _cache -> (etag, compressed page or None)
+        self._pages: dict[Any, tuple[str, bytes | None]] = {}
+        # path -> (etag, data, compressed data)
+        self._static: dict[str, tuple[str, bytes, bytes]] = {}
+        self.workers = 0
+
+    def getBoxClass(self, name):
+        """Import generator class on first use"""
+        box_cls = self.boxes[name].load()
+        box_cls.UI = "web"
+        return box_cls
 
     def getLanguages(self, domain=None, localedir=None):
         if self._languages is not None:
@@ -186,7 +395,19 @@ class BServer:
         except OSError:
             return gettext.translation('boxes.py', languages=langs, fallback=True)
 
+    def getTranslation(self, lang_name):
+        """Translation for a language name as found in lang.info()"""
+        if lang_name:
+            for localedir in ("locale", None):
+                try:
+                    return gettext.translation('boxes.py', localedir=localedir, languages=[lang_name])
+                except OSError:
+                    pass
+        return gettext.NullTranslations()
+
     def arg2html(self, a, prefix, defaults={}, _=lambda s: s):
+        import markdown  # type: ignore
+
         name = a.option_strings[0].replace("-", "")
         if isinstance(a, argparse._HelpAction):
             return ""
@@ -226,6 +447,8 @@ class BServer:
         return self.args2html(name, box, lang, action, defaults)
 
     def args2html(self, name, box, lang, action="", defaults={}):
+        import markdown  # type: ignore
+
         _ = lang.gettext
         lang_name = lang.info().get('language', None)
 
@@ -537,13 +760,66 @@ class BServer:
         # Images do not have charset. Just bytes. Except text based svg.
         # Todo: fallback if type_ is None?
         if type_ is not None and "image" in type_ and type_ != "image/svg+xml":
-            start_response("200 OK", [('Content-type', "%s" % type_)])
+            headers = [('Content-type', "%s" % type_)]
         else:
-            start_response("200 OK", [('Content-type', f"{type_}; charset={encoding}")])
-
+            headers = [('Content-type', f"{type_}; charset={encoding}")]
+
+        st = os.stat(path)
+        etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+        headers.append(('Cache-Control', f"public, max-age={self.static_max_age}"))
+        entry = None
+        if is_compressible(headers) and st.st_size <= self.static_memory_limit:
+            headers.append(('Vary', 'Accept-Encoding'))
+            entry = self._static.get(path)
+            if entry is None or entry[0] != etag:
+                with open(path, "rb") as f:
+                    data = f.read()
+                entry = self._static[path] = (etag, data, gzip.compress(data, 9, mtime=0))
+        compressed = entry is not None and accepts_gzip(environ) and len(entry[2]) < len(entry[1])
+        if compressed:
+            etag = gzip_etag(etag)
+        headers.append(('ETag', etag))
+        if etag_matches(environ, etag):
+            return not_modified(start_response, headers)
+        if compressed:
+            headers.append(('Content-Encoding', 'gzip'))
+            start_response("200 OK", headers)
+            return [entry[2]]
+        start_response("200 OK", headers)
+        if entry is not None:
+            return [entry[1]]
         f = open(path, 'rb')
         return environ['wsgi.file_wrapper'](f, 512 * 1024)
 
+    def sendPage(self, environ, start_response, status, headers, body, key=None):
+        """Send a generated page with ETag, compressed if the client accepts it
+
+        If key is given the page must not change. Its ETag and compressed
+        version are then kept in memory.
+        """
+        data = b"".join(body)
+        if key is not None and key in self._pages:
+            etag, compressed = self._pages[key]
+        else:
+            etag = f'"{hashlib.sha256(data).hexdigest()[:32]}"'
+            compressed = None
+        use_gzip = accepts_gzip(environ)
+        if use_gzip and compressed is None:
+            compressed = gzip.compress(data, 9, mtime=0)
+        if key is not None:
+            self._pages[key] = (etag, compressed)
+        if use_gzip:
+            etag = gzip_etag(etag)
+        headers = headers + [('Vary', 'Accept-Encoding'), ('ETag', etag)]
+        if etag_matches(environ, etag):
+            return not_modified(start_response, headers)
+        if use_gzip:
+            headers.append(('Content-Encoding', 'gzip'))
+            start_response(status, headers)
+            return [compressed]
+        start_response(status, headers)
+        return [data]
+
     def getURL(self, environ) -> str:
         url = environ['wsgi.url_scheme'] + '://'
 
@@ -570,10 +846,10 @@ class BServer:
         _ = lang.gettext
         lang_name = lang.info().get('language', None)
 
-        start_response("200 OK", [('Content-type', "text/html; charset=utf-8")])
-
-        if ("Gallery", lang_name) in self._cache:
-            return self._cache[("Gallery", lang_name)]
+        headers = [('Content-type', "text/html; charset=utf-8")]
+        key = ("Gallery", lang_name)
+        if key in self._cache:
+            return self.sendPage(environ, start_response, "200 OK", headers, self._cache[key], key)
 
         langparam = ""
         if lang_name:
@@ -618,8 +894,8 @@ class BServer:
 </html>
 """
                       )
-        self._cache[("Gallery", lang_name)] = [s.encode("utf-8") for s in result]
-        return self._cache[("Gallery", lang_name)]
+        self._cache[key] = [s.encode("utf-8") for s in result]
+        return self.sendPage(environ, start_response, "200 OK", headers, self._cache[key], key)
 
     def serve(self, environ, start_response):
         # serve favicon from static for generated SVGs
@@ -649,16 +925,17 @@ class BServer:
         if not name or name == "Gallery":
             return self.serveGallery(environ, start_response, lang)
 
-        box_cls = self.boxes.get(name, None)
-        if not box_cls:
-            start_response(status, headers)
+        if name == "cache_stats":
+            start_response(status, [('Content-type', 'application/json; charset=utf-8'), ('Cache-Control', 'no-store')])
+            return [json.dumps(self.render_cache.info() if self.render_cache else {}).encode("utf-8")]
 
+        if name not in self.boxes:
             lang_name = lang.info().get('language', None)
             if lang_name not in self._cache:
                 self._cache[lang_name] = list(self.genPageMenu(lang))
-            return self._cache[lang_name]
+            return self.sendPage(environ, start_response, status, headers, self._cache[lang_name], lang_name)
 
-        box = box_cls()
+        box = self.getBoxClass(name).cachedInstance()
 
         box.translations = lang
 
@@ -669,8 +946,9 @@ class BServer:
                 if len(kv) == 2:
                     k, v = kv
                     defaults[k] = html.escape(v, True)
-            start_response(status, headers)
-            return self.args2html_cached(name, box, lang, "./" + name, defaults=defaults)
+            key = None if defaults else (name, lang.info().get('language', None), "./" + name)
+            return self.sendPage(environ, start_response, status, headers,
+                                 self.args2html_cached(name, box, lang, "./" + name, defaults=defaults), key)
 
         args = ["--" + arg for arg in args if not arg.startswith("render=")]
         try:
@@ -683,23 +961,69 @@ class BServer:
                 start_response(status, headers)
                 return self.genPageError(name, e, lang)
 
+        # renders only differ in the creation date if the code and
+        # the arguments are the same
+        lang_name = lang.info().get('language', None)
+        base_url = self.getURL(dict(environ, QUERY_STRING=""))
+        etag = f'W/"{render_key(self.stamp, name, box.non_default_args, box.format, lang_name, render, base_url)[:32]}"'
+        if etag_matches(environ, etag):
+            return not_modified(start_response, [('ETag', etag), ('Cache-Control', self.render_cache_control),
+                                                 ('Vary', 'Accept-Encoding')])
+
+        use_gzip = accepts_gzip(environ)
+        cache_key = None
+        if self.render_cache:
+            cache_key = self.render_cache.key(
+                name, box.non_default_args, box.format,
+                lang_name, render, base_url, use_gzip)
+            cached = self.render_cache.get(cache_key)
+            if cached is not None:
+                start_response(status, cached[0])
+                return [cached[1]]
+
+        url = self.getURL(environ)
+        if self.workers:
+            status, http_headers, data, ok = self.renderInWorker(name, args, lang, url, render, headers)
+        else:
+            status, http_headers, data, ok = self.renderBox(box, lang, url, render, headers)
+        if ok:
+            http_headers = http_headers + [('ETag', etag), ('Cache-Control', self.render_cache_control)]
+            if is_compressible(http_headers):
+                http_headers.append(('Vary', 'Accept-Encoding'))
+                if use_gzip:
+                    http_headers.append(('Content-Encoding', 'gzip'))
+                    data = gzip_chunks(data)
+        start_response(status, http_headers)
+        if ok and cache_key:
+            return self.render_cache.wrap(cache_key, http_headers, data)
+        return data
+
+    def renderBox(self, box, lang, url, render, headers):
+        """Render a box with already parsed arguments
+
+        Returns status, headers, data and whether the result is a
+        successful render.
+        """
+        name = box.__class__.__name__
         try:
-            box.metadata["url"] = self.getURL(environ)
+            box.metadata["url"] = url
             box.metadata["url_short"] = filter_url(box.metadata["url"],
                                                    box.non_default_args)
             box.open()
             box.render()
-            data = box.close()
+            data = box.close_iter()
+            # start creating the output to catch errors early
+            data = itertools.chain((next(data, b""),), data)
+        except RenderTimeout:
+            raise
         except Exception as e:
             if not isinstance(e, ValueError):
                 print("Exception during rendering:")
                 traceback.print_exc()
             if render == "4" and isinstance(e, ValueError):
-                start_response(status, box.formats.http_headers["svg"])
-                return self.genPageErrorSVG(name, e, lang)
+                return "200 OK", box.formats.http_headers["svg"], self.genPageErrorSVG(name, e, lang), False
             else:
-                start_response("500 Internal Server Error", headers)
-                return self.genPageError(name, e, lang)
+                return "500 Internal Server Error", headers, self.genPageError(name, e, lang), False
 
         http_headers = box.formats.http_headers.get(box.format, [('Content-type', 'application/unknown; charset=utf-8')])[:]
         # Prevent crawlers.
@@ -709,21 +1033,118 @@ class BServer:
             http_headers = [('Content-type', 'image/png')]
             http_headers.append(('X-Robots-Tag', 'noindex,nofollow'))
             qr_format = "png"
-            fn = box.__class__.__name__
-            start_response(status, http_headers)
             qrcode = get_qrcode(box.metadata["url_short"], qr_format)
-            return (qrcode,)
+            return "200 OK", http_headers, (qrcode,), True
 
         if box.format != "svg" or render == "2":
             extension = box.format
             if extension == "svg_Ponoko":
                 extension = "svg"
-            http_headers.append(('Content-Disposition', f'attachment; filename="{box.__class__.__name__}.{extension}"'))
-        start_response(status, http_headers)
-        return environ['wsgi.file_wrapper'](data, 512 * 1024)
+            http_headers.append(('Content-Disposition', f'attachment; filename="{name}.{extension}"'))
+        return "200 OK", http_headers, data, True
+
+    def startWorkers(self, workers: int, timeout: float = 60.0, queue_size: int = 16) -> None:
+        """Dispatch renders to a pool of worker processes
+
+        Up to workers + queue_size renders are accepted at a time, more
+        requests are rejected with 503.
+        """
+        self.workers = workers
+        self.worker_timeout = timeout
+        self._worker_slots = threading.BoundedSemaphore(workers + queue_size)
+        self._pool_lock = threading.Lock()
+        self._pool = None
+        self._getPool()
+
+    def _getPool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = concurrent.futures.ProcessPoolExecutor(
+                    self.workers, initializer=_initWorker,
+                    initargs=({"url_prefix": self.url_prefix, "static_url": self.static_url,
+                               "static_path": self.staticdir, "legal_url": self.legal_url},))
+                # start all workers now instead of on first use
+                for f in [self._pool.submit(_pingWorker) for _ in range(self.workers)]:
+                    f.result()
+            return self._pool
+
+    def renderInWorker(self, name, args, lang, url, render, headers):
+        _ = lang.gettext
+        if not self._worker_slots.acquire(blocking=False):
+            return ("503 Service Unavailable", headers + [('Retry-After', '10')],
+                    self.genPageError(name, _("Server is busy. Please try again later."), lang), False)
+        pool = None
+        try:
+            try:
+                pool = self._getPool()
+                future = pool.submit(_renderWorker, name, args, lang.info().get('language', None),
+                                     url, render, headers, self.worker_timeout)
+            except BaseException:
+                self._worker_slots.release()
+                raise
+            # keep the slot until the render is done - even after giving up on it
+            future.add_done_callback(lambda f: self._worker_slots.release())
+            # the worker enforces the timeout, waiting covers queueing and hung workers
+            return future.result(timeout=2 * self.worker_timeout + 10)
+        except concurrent.futures.TimeoutError:
+            # drop it if still queued, a running render frees the slot when done
+            future.cancel()
+            return "504 Gateway Timeout", headers, self.genPageError(name, _("Rendering took too long."), lang), False
+        except concurrent.futures.process.BrokenProcessPool as e:
+            print("Render worker died, restarting pool")
+            with self._pool_lock:
+                if self._pool is pool:
+                    self._pool = None
+            return "500 Internal Server Error", headers, self.genPageError(name, e, lang), False
+
+
+class RenderTimeout(Exception):
+    pass
+
+
+_worker_server: BServer | None = None
+
+
+def _initWorker(kw) -> None:
+    global _worker_server
+    _worker_server = BServer(cache_size=0, **kw)
+    boxes.generators.getAllBoxGenerators()
+
+
+def _pingWorker() -> None:
+    pass
+
+
+def _alarm(signum, frame) -> NoReturn:
+    raise RenderTimeout()
+
+
+def _renderWorker(name, args, lang_name, url, render, headers, timeout):
+    """Render in a worker process, returns data as a list of a single bytes object"""
+    server = _worker_server
+    lang = server.getTranslation(lang_name)
+    box = server.getBoxClass(name).cachedInstance()
+    box.translations = lang
+    box.parseArgs(args)
+    use_alarm = timeout and hasattr(signal, "setitimer")
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        status, http_headers, data, ok = server.renderBox(box, lang, url, render, headers)
+        data = [b"".join(data)]
+    except RenderTimeout:
+        return ("504 Gateway Timeout", headers,
+                server.genPageError(name, lang.gettext("Rendering took too long."), lang), False)
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    return status, http_headers, data, ok
 
 
 def get_qrcode(url, format):
+    import qrcode
+
     if url is None:
         url = "no url"
     img = qrcode.make(url)
@@ -745,15 +1166,34 @@ def main() -> None:
                         help="location of static content on disk")
     parser.add_argument("--legal_url", default="",
                         help="URL of legal web page")
+    parser.add_argument("--cache_size", type=int, default=64,
+                        help="size of the render cache in MB, 0 to disable")
+    parser.add_argument("--cache_dir", default=None,
+                        help="directory to keep rendered results in")
+    parser.add_argument("--static_max_age", type=int, default=7 * 24 * 3600,
+                        help="seconds clients and proxies may cache static content")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="number of render worker processes, 0 to render in the server process")
+    parser.add_argument("--render_timeout", type=float, default=60.0,
+                        help="maximum time in seconds for rendering in a worker")
+    parser.add_argument("--queue_size", type=int, default=16,
+                        help="number of renders waiting for a worker before requests are rejected")
     args = parser.parse_args()
 
     boxserver = BServer(url_prefix=args.url_prefix, static_url=args.static_url,
-                        static_path=args.static_path)
+                        static_path=args.static_path,
+                        cache_size=args.cache_size, cache_dir=args.cache_dir,
+                        static_max_age=args.static_max_age)
+    if args.workers:
+        boxserver.startWorkers(args.workers, args.render_timeout, args.queue_size)
 
     fc = FileChecker()
     fc.start()
 
-    httpd = make_server(args.host, args.port, boxserver.serve)
+    if args.workers:
+        httpd = make_server(args.host, args.port, boxserver.serve, server_class=ThreadingWSGIServer)
+    else:
+        httpd = make_server(args.host, args.port, boxserver.serve)
     print(f"BoxesServer serving on {args.host}:{args.port}...")
     try:
         httpd.serve_forever()
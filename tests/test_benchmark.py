@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import importlib.util
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+try:
+    import boxes
+except ImportError:
+    sys.path.append(Path(__file__).resolve().parent.parent.__str__())
+    import boxes
+
+import boxes.benchmark
+import boxes.generators
+
+
+class TestBenchmarkTools:
+    """Measuring and comparing with one small generator"""
+
+    def test_benchmark_generator(self) -> None:
+        result = boxes.benchmark.benchmarkGenerator(boxes.generators.getBoxGenerator("ABox"), repeat=1)
+        assert set(result) == {*boxes.benchmark.PHASES, "total", "peak_memory", "segments", "output_bytes"}
+        assert result["total"] == sum(result[p] for p in boxes.benchmark.PHASES)
+        assert result["segments"] > 0 and result["output_bytes"] > 0
+
+    def test_output_sizes(self) -> None:
+        result = boxes.benchmark.outputSizes(boxes.generators.getBoxGenerator("ABox"), repeat=1)
+        assert set(result) == {"plain_bytes", "plain_time", "compact_bytes", "compact_time"}
+        assert 0 < result["compact_bytes"] < result["plain_bytes"]
+
+    @staticmethod
+    def results(total: float, memory: int = 1000) -> dict:
+        return {"generators": {"ABox": {"total": total, "peak_memory": memory}}}
+
+    def test_compare(self) -> None:
+        compare = boxes.benchmark.compare
+        baseline = self.results(0.1)
+        # 30% slower
+        assert compare(self.results(0.13), baseline) == [("ABox", "total", 0.1, 0.13)]
+        assert compare(self.results(0.13), baseline, threshold=0.5) == []
+        # 10% slower, but below the threshold
+        assert compare(self.results(0.11), baseline) == []
+        # 50% slower, but less than min_time
+        assert compare(self.results(0.0015), self.results(0.001)) == []
+        assert compare(self.results(0.0015), self.results(0.001), min_time=0.0) == [
+            ("ABox", "total", 0.001, 0.0015)]
+        assert compare(self.results(0.1, 1500), baseline) == [("ABox", "peak_memory", 1000, 1500)]
+        # new generators are not compared
+        assert compare(self.results(0.2), {"generators": {}}) == []
+
+    def test_format_table(self) -> None:
+        result = boxes.benchmark.benchmarkGenerator(boxes.generators.getBoxGenerator("ABox"), repeat=1)
+        baseline = {"generators": {"ABox": dict(result, total=result["total"] / 2)}}
+        table = boxes.benchmark.formatTable({"generators": {"ABox": result}}, baseline)
+        assert table.splitlines()[1].startswith("ABox")
+        assert "+100%" in table
+
+
+BENCHMARK = bool(os.environ.get("BOXES_BENCHMARK"))
+
+
+@pytest.mark.skipif(not BENCHMARK, reason="slow, set BOXES_BENCHMARK=1 or use boxes --benchmark --pytest")
+@pytest.mark.skipif(importlib.util.find_spec("pytest_benchmark") is None, reason="needs pytest-benchmark")
+class TestBenchmark:
+    """Render time of all generators with default settings.
+
+    Needs pytest-benchmark and only runs with BOXES_BENCHMARK=1 set - e.g.
+    by boxes --benchmark --pytest. Compare runs with --benchmark-autosave
+    and --benchmark-compare.
+    """
+    generators = boxes.benchmark.generators() if BENCHMARK else {}
+
+    @pytest.mark.parametrize("name", generators.keys())
+    def test_render(self, name: str, benchmark) -> None:
+        cls = self.generators[name].load()
+        times, box, data = benchmark(boxes.benchmark.renderPhases, cls)
+        benchmark.extra_info.update(times)
+        benchmark.extra_info["segments"] = box.surface.count
+        benchmark.extra_info["output_bytes"] = len(data.getvalue())
+        assert data.getvalue()
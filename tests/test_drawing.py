@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+try:
+    import boxes
+except ImportError:
+    sys.path.append(Path(__file__).resolve().parent.parent.__str__())
+    import boxes
+
+import boxes.generators
+from boxes import edges
+from boxes.formats import Formats
+from boxes.drawing import Part, Path as DrawingPath, PolylineSurface, order_paths, remove_duplicate_segments, travel_length
+
+
+class BumpEdge(edges.BaseEdge):
+    """Edge with a bump of the height of the bump attribute of the generator"""
+    char = "b"
+    calls = 0
+
+    def __call__(self, length, **kw):
+        BumpEdge.calls += 1
+        h = self.boxes.bump
+        self.polyline(length / 2 - 5, -90, h, 90, 10, 90, h, -90, length / 2 - 5)
+
+
+def new_box(*args: str) -> boxes.Boxes:
+    box = boxes.Boxes()
+    box.parseArgs(["--reference", "0", *args])
+    box.metadata["reproducible"] = True
+    box.open()
+    return box
+
+
+class TestReplay:
+    """Record and replay of identical parts - see boxes.replayable()"""
+
+    def walls(self, box: boxes.Boxes, bumps, replay: bool) -> list[float]:
+        bump = BumpEdge(box, None)
+        heights = []
+        for h in bumps:
+            box.bump = h
+            kw = {"replay": box.bump} if replay else {}
+            box.rectangularWall(30, 20, [bump, "e", "f", "F"], move="right", **kw)
+            extents = box.surface.parts[-2].extents()
+            heights.append(extents.ymax - extents.ymin)
+        return heights
+
+    def test_replayed(self) -> None:
+        BumpEdge.calls = 0
+        heights = self.walls(new_box(), (0.0, 0.0, 0.0), replay=True)
+        assert BumpEdge.calls == 2
+        assert heights[0] == heights[1] == heights[2]
+
+    def test_changed_dependency(self) -> None:
+        BumpEdge.calls = 0
+        heights = self.walls(new_box(), (0.0, 0.0, 0.0, 10.0, 10.0, 10.0), replay=True)
+        assert BumpEdge.calls == 4
+        assert heights[0] == heights[1] == heights[2]
+        assert heights[3] > heights[2] + 9.0
+        assert heights[3] == heights[4] == heights[5]
+
+    def test_no_replay_without_key(self) -> None:
+        BumpEdge.calls = 0
+        self.walls(new_box(), (0.0, 0.0, 0.0), replay=False)
+        assert BumpEdge.calls == 3
+
+    def test_same_output(self) -> None:
+        bumps = (0.0, 0.0, 0.0, 10.0, 10.0, 10.0)
+        output = []
+        for replay in (False, True):
+            box = new_box()
+            self.walls(box, bumps, replay)
+            output.append(box.close().getvalue())
+        assert output[0] == output[1]
+
+
+class TestJoinStrokes:
+    """Joining strokes to the pathes ending at their start - see Part.stroke()"""
+
+    @staticmethod
+    def stroke(part: Part, params, *points) -> None:
+        part.move_to(*points[0])
+        for xy in points[1:]:
+            part.append("L", *xy)
+        part.stroke(**params)
+
+    def test_join(self) -> None:
+        part = Part("part")
+        self.stroke(part, {"rgb": (0, 0, 0)}, (0, 0), (10, 0))
+        self.stroke(part, {"rgb": (1, 0, 0)}, (10, 0), (10, 10))
+        self.stroke(part, {"rgb": (0, 0, 0)}, (10, 0), (20, 0))
+        assert [len(p) for p in part.pathes] == [3, 2]
+
+    def test_join_unhashable_params(self) -> None:
+        part = Part("part")
+        self.stroke(part, {"rgb": [0, 0, 0]}, (0, 0), (10, 0))
+        self.stroke(part, {"rgb": [0, 0, 0]}, (10, 0), (20, 0))
+        self.stroke(part, {"rgb": [1, 0, 0]}, (20, 0), (30, 0))
+        assert [len(p) for p in part.pathes] == [3, 2]
+
+
+class TestRemoveDuplicates:
+    """Dropping cuts shared by several parts - see Surface.remove_duplicates()"""
+
+    @staticmethod
+    def part(*lines) -> Part:
+        part = Part("part")
+        for x0, y0, x1, y1 in lines:
+            part.pathes.append(DrawingPath([("M", x0, y0), ("L", x1, y1)],
+                                           {"rgb": (0, 0, 0), "lw": 0.1}))
+        return part
+
+    def test_removed_length(self) -> None:
+        # 10mm line, the second one overlaps by 6mm and is trimmed to 4mm
+        parts = [self.part((0, 0, 10, 0)), self.part((4, 0, 18, 0), (0, 5, 10, 5))]
+        assert remove_duplicate_segments(parts) == 6.0
+        assert [[tuple(s) for s in p] for p in parts[1].pathes] == [
+            [("M", 10.0, 0.0), ("L", 18, 0)], [("M", 0, 5), ("L", 10, 5)]]
+
+    def test_removed_length_after_corners(self) -> None:
+        # the identical corner is removed: both lines, 10mm + 10mm
+        parts = [self.part((0, 0, 10, 0), (10, 0, 10, 10)) for _ in range(2)]
+        assert remove_duplicate_segments(parts, inner_corners="corner") == 20.0
+        assert parts[1].pathes == []
+
+
+class TestOrderPaths:
+    """Travel optimization shared by Part.optimize_order() and the polyline formats"""
+
+    @staticmethod
+    def order(polylines, x=0.0, y=0.0):
+        return order_paths(polylines, PolylineSurface._polyline_ends, PolylineSurface._reversed_polyline,
+                           x, y, PolylineSurface._rotated_polyline)
+
+    def test_nearest_and_reversed(self) -> None:
+        lines = [[(20, 0), (30, 0)], [(20, 0), (10, 0)], [(0, 0), (10, 0)]]
+        ordered, end = self.order(lines)
+        assert ordered == [[(0, 0), (10, 0)], [(10, 0), (20, 0)], [(20, 0), (30, 0)]]
+        assert end == (30, 0)
+
+    def test_keep_original_order(self) -> None:
+        lines = [[(0, 0), (10, 0)], [(10, 0), (20, 0)]]
+        ordered, end = self.order(lines)
+        assert ordered == lines
+        assert end == (20, 0)
+
+    def test_rotate_closed(self) -> None:
+        square = [(0, 0), (10, 0), (10, 10), (0, 10), (0, 0)]
+        ordered, end = self.order([square], 12, 12)
+        assert ordered == [[(10, 10), (0, 10), (0, 0), (10, 0), (10, 10)]]
+        assert end == (10, 10)
+
+    def test_travel_length(self) -> None:
+        assert travel_length([(3, 4, 10, 0), (10, 0, 0, 0)]) == 5.0
+
+
+class TestBXG:
+    """Saving the drawing in bxg format and writing it later - see BXGSurface"""
+
+    def test_round_trip_instances(self) -> None:
+        box = boxes.generators.getBoxGenerator("TypeTray")()
+        box.parseArgs(["--instances", "1", "--format", "bxg"])
+        box.metadata["reproducible"] = True
+        box.open()
+        box.render()
+        data = box.close(["bxg", "svg"])
+        svg = data["svg"].getvalue()
+        converted = Formats().convertGeometry(data["bxg"].getvalue(), "svg").getvalue()
+        assert b"<use " in svg
+        assert converted == svg
+
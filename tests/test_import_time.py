@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+RENDER = """
+import json, sys
+import boxes
+from boxes.generators.universalbox import UniversalBox
+box = UniversalBox()
+box.parseArgs([])
+box.open()
+box.render()
+box.close()
+print(json.dumps(sorted({m.split(".")[0] for m in sys.modules})))
+"""
+
+
+class TestImportTime:
+    """Import boxes and render a simple generator in a fresh interpreter.
+
+    Heavy modules slow down the start of every run and are only imported
+    when used.
+    """
+
+    heavyModules = ("shapely", "qrcode", "markdown", "numpy")
+
+    def test_no_heavy_imports(self) -> None:
+        root = Path(__file__).resolve().parent.parent
+        result = subprocess.run([sys.executable, "-c", RENDER], cwd=root,
+                                capture_output=True, text=True, check=True)
+        modules = json.loads(result.stdout)
+        for module in self.heavyModules:
+            assert module not in modules, f"{module} imported without being used"